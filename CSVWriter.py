@@ -0,0 +1,139 @@
+import os
+import tempfile
+from itertools import islice
+
+import numpy as np
+
+from Constants import *
+
+# The process's umask, read once (it can only be read by setting it) so
+# written files get the permissions open(..., 'w') would give them
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+################################################################################
+
+# Writes a CSV file from a header and columns (arrays, 2D arrays holding
+# several columns, or iterables), formatting CSV_CHUNK_ROWS rows at a time.
+# The file appears atomically once complete; if exclusive, an existing file
+# is never replaced (FileExistsError is raised instead)
+def writeCSV(filename, header, columns, exclusive = False,
+             chunkRows = CSV_CHUNK_ROWS):
+
+    tmp = writeTemporary(filename, header, columns, chunkRows)
+    try:
+        if (exclusive):
+            claimName(tmp, filename)
+        else:
+            os.replace(tmp, filename)
+    finally:
+        if (os.path.exists(tmp)):
+            os.remove(tmp)
+
+    return filename
+
+################################################################################
+
+# Writes a CSV file to the first free name prefix + n + suffix with
+# n < maxFiles, returning the name (or None if they are all taken)
+def writeNumberedCSV(prefix, suffix, header, columns, maxFiles = MAX_FILES,
+                     chunkRows = CSV_CHUNK_ROWS):
+
+    tmp = writeTemporary(prefix + suffix, header, columns, chunkRows)
+    try:
+        # Claiming fails if the name exists, so two writers never share one
+        for n in range(maxFiles):
+            filename = prefix + str(n) + suffix
+            try:
+                claimName(tmp, filename)
+                return filename
+            except FileExistsError:
+                continue
+    finally:
+        if (os.path.exists(tmp)):
+            os.remove(tmp)
+
+    return None
+
+################################################################################
+
+# Gives the complete temporary file the name filename, raising
+# FileExistsError if it is taken. A hard link claims the name atomically;
+# on filesystems without hard links the name is claimed by creating it
+# exclusively, and the temporary file is then renamed over it
+def claimName(tmp, filename):
+
+    try:
+        os.link(tmp, filename)
+        return
+    except FileExistsError:
+        raise
+    except OSError:
+        pass
+
+    os.close(os.open(filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666))
+    os.replace(tmp, filename)
+
+################################################################################
+
+# Writes the CSV to a temporary file next to filename and returns its name.
+# mkstemp makes the file readable by its owner only, so it is given the
+# usual permissions before it is renamed or linked into place
+def writeTemporary(filename, header, columns, chunkRows):
+
+    directory, name = os.path.split(os.path.abspath(filename))
+    descriptor, tmp = tempfile.mkstemp(prefix = "." + name + ".",
+                                       dir = directory)
+    try:
+        os.fchmod(descriptor, 0o666 & ~UMASK)
+        with os.fdopen(descriptor, 'w') as file:
+            file.write(header + "\n")
+            for chunk in csvChunks(columns, chunkRows):
+                file.write(chunk)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+    return tmp
+
+################################################################################
+
+# Yields the rows of the columns as CSV text, chunkRows rows at a time
+def csvChunks(columns, chunkRows):
+
+    readers = [columnChunks(column, chunkRows) for column in columns]
+
+    while True:
+        cells = [next(reader, None) for reader in readers]
+        if (any(cell is None for cell in cells)):
+            assert(all(cell is None for cell in cells))
+            return
+
+        # Format Python values, as "{}".format does for the NumPy ones
+        values = []
+        for cell in cells:
+            if (cell.ndim == 2):
+                values.extend(cell.T.tolist())
+            else:
+                values.append(cell.tolist())
+        rowFormat = ",".join(["{}"] * len(values)) + "\n"
+        yield "".join(map(rowFormat.format, *values))
+
+################################################################################
+
+# Yields successive blocks of up to chunkRows rows of a column as arrays
+def columnChunks(column, chunkRows):
+
+    if (isinstance(column, np.ndarray) or isinstance(column, range)):
+        for start in range(0, len(column), chunkRows):
+            yield np.asarray(column[start:start + chunkRows])
+        return
+
+    column = iter(column)
+    while True:
+        block = list(islice(column, chunkRows))
+        if (not block):
+            return
+        yield np.asarray(block)
+
+################################################################################
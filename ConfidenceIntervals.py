@@ -0,0 +1,112 @@
+from multiprocessing import Pool
+from statistics import NormalDist
+
+import numpy as np
+
+from Constants import *
+
+################################################################################
+
+# Returns the AUC and its (1 - alpha) confidence interval from DeLong's
+# variance estimate, as (auc, low, high)
+def delongInterval(real, predictions, alpha = 0.05):
+
+    real = np.asarray(real) == REAL
+    predictions = np.asarray(predictions, dtype=np.float64)
+    positives = np.sort(predictions[real])
+    negatives = np.sort(predictions[~real])
+    P, N = len(positives), len(negatives)
+    if (P < 2 or N < 2):
+        raise ValueError("DeLong's interval needs at least two instances of "
+                         "each class")
+
+    # The fraction of the other class each instance beats, with ties as half
+    below = np.searchsorted(negatives, positives, side='left')
+    equal = np.searchsorted(negatives, positives, side='right') - below
+    positiveWins = (below + 0.5 * equal) / N
+    above = P - np.searchsorted(positives, negatives, side='right')
+    equal = np.searchsorted(positives, negatives, side='right') \
+            - np.searchsorted(positives, negatives, side='left')
+    negativeLosses = (above + 0.5 * equal) / P
+
+    auc = positiveWins.mean()
+    variance = positiveWins.var(ddof = 1) / P + negativeLosses.var(ddof = 1) / N
+    z = NormalDist().inv_cdf(1 - alpha / 2)
+    spread = z * np.sqrt(variance)
+
+    return float(auc), float(max(auc - spread, 0.0)), \
+           float(min(auc + spread, 1.0))
+
+################################################################################
+
+# Returns percentile bootstrap intervals as {"AUC": (low, high),
+# "Accuracy": (low, high)}. Positives and negatives are resampled separately
+# (so every resample has both), in batches spread over `workers` processes
+def bootstrapIntervals(real, predictions, resamples = BOOTSTRAP_RESAMPLES,
+                       alpha = 0.05, workers = WORKERS, seed = None):
+
+    real = np.asarray(real) == REAL
+    predictions = np.asarray(predictions, dtype=np.float64)
+    if (not np.any(real) or np.all(real)):
+        raise ValueError("Bootstrapping the AUC needs both classes")
+
+    batches = -(-resamples // BOOTSTRAP_BATCH)
+    seeds = np.random.SeedSequence(seed).spawn(batches)
+    sizes = [BOOTSTRAP_BATCH] * (batches - 1) \
+            + [resamples - BOOTSTRAP_BATCH * (batches - 1)]
+    jobs = [(real, predictions, size, batchSeed)
+            for size, batchSeed in zip(sizes, seeds)]
+
+    if (workers > 1 and batches > 1):
+        with Pool(min(workers, batches)) as pool:
+            results = pool.map(bootstrapBatch, jobs)
+    else:
+        results = [bootstrapBatch(job) for job in jobs]
+
+    aucs = np.concatenate([aucs for aucs, accuracies in results])
+    accuracies = np.concatenate([accuracies for aucs, accuracies in results])
+    percentiles = [100 * alpha / 2, 100 * (1 - alpha / 2)]
+
+    return {"AUC": tuple(np.percentile(aucs, percentiles).tolist()),
+            "Accuracy": tuple(np.percentile(accuracies, percentiles).tolist())}
+
+################################################################################
+
+# Returns the AUCs and accuracies of one batch of stratified resamples
+def bootstrapBatch(job):
+
+    real, predictions, size, seed = job
+    rng = np.random.default_rng(seed)
+
+    # Sort once, and group tied predictions so they count as half
+    order = np.argsort(predictions, kind='mergesort')
+    predictions = predictions[order]
+    real = real[order]
+    correct = np.abs(real - predictions) < 0.5
+    starts = np.append(0, np.flatnonzero(np.diff(predictions)) + 1)
+
+    n = len(real)
+    groups = [np.flatnonzero(real), np.flatnonzero(~real)]
+    aucs = np.zeros(size)
+    accuracies = np.zeros(size)
+
+    # One resample at a time, so memory stays O(n) for any batch size
+    for i in range(size):
+        drawn = np.concatenate([members[rng.integers(0, len(members),
+                                                     size = len(members))]
+                                for members in groups])
+
+        # How many times each instance is drawn
+        weights = np.bincount(drawn, minlength = n).astype(np.float64)
+
+        positives = np.add.reduceat(weights * real, starts)
+        negatives = np.add.reduceat(weights * ~real, starts)
+        negativesBelow = np.cumsum(negatives) - negatives
+        aucs[i] = np.sum(positives * (negativesBelow + 0.5 * negatives))
+        accuracies[i] = weights @ correct / n
+
+    aucs /= np.sum(real) * np.sum(~real)
+
+    return aucs, accuracies
+
+################################################################################
@@ -21,6 +21,9 @@ DEVELOPMENT_FEATURES_FILE = "development-features.txt"
 # The file containing our processes test instances
 TEST_FEATURES_FILE = "test-features.txt"
 
+# The extension of the binary copy saved alongside each feature file
+FEATURE_BINARY_SUFFIX = ".feat"
+
 # The number of features per instance in the processed files
 FEATURES = 4
 
@@ -48,3 +51,98 @@ TRAINING_LIMIT = 4000
 
 # The limit for the number of development instances of each type (REAL + FAKE)
 DEV_LIMIT = 1000
+
+# The suffix of the directory that caches the parsed training graph
+CACHE_SUFFIX = ".cache"
+
+# The number of bytes read at a time when parsing the input files
+CHUNK_SIZE = 1 << 22
+
+# The most pairs the similarity engine processes in one sparse product
+ENGINE_PAIRS = 256
+
+# The most (pair, neighbour) terms the similarity engine holds at once
+ENGINE_TERMS = 1 << 18
+
+# The number of processes used to compute features (1 computes them serially)
+WORKERS = 1
+
+# The number of chunks of pairs handed to each feature worker
+WORKER_CHUNKS = 8
+
+# The most node IDs held by each NeighbourCache (weighted by set size)
+NEIGHBOUR_CACHE_BUDGET = 10**7
+
+# Whether to estimate similarity features from MinHash signatures
+APPROXIMATE = False
+
+# The number of hash functions in each MinHash signature
+MINHASH_LENGTH = 64
+
+# The number of bands and rows per band in the LSH neighbour index
+# (LSH_BANDS * LSH_ROWS must not exceed MINHASH_LENGTH)
+LSH_BANDS = 32
+LSH_ROWS = 2
+
+# The number of score bins per class in the streaming evaluator
+STREAMING_BINS = 1 << 16
+
+# The number of lines the streaming evaluator reads from each file at a time
+CHUNK_ROWS = 1 << 20
+
+# The number of bootstrap resamples for confidence intervals, and how many
+# are drawn at once
+BOOTSTRAP_RESAMPLES = 2000
+BOOTSTRAP_BATCH = 250
+
+# The number of rows formatted at a time when writing CSV files
+CSV_CHUNK_ROWS = 1 << 16
+
+# The directory of the persistent feature store, or None to always recompute
+FEATURE_STORE_DIR = "features.store"
+
+# The most segments the feature store keeps before merging them into one
+FEATURE_STORE_SEGMENTS = 16
+
+# The names of the features CreateFeatureFile computes (see FeatureRegistry),
+# or None for all 28 similarity features
+SELECTED_FEATURES = None
+
+# The backend runNN trains with ("tensorflow" or "numpy")
+NN_BACKEND = "tensorflow"
+
+# The offset addE adds to every feature so none are 0.0
+ADD_E = 0.001
+
+# The file runNN saves the trained network to, and Predictor loads it from
+MODEL_FILE = "model.npz"
+
+# The number of rows the predictor scores at a time
+PREDICT_CHUNK_ROWS = 1 << 16
+
+# How many epochs apart runNN scores the validation set when stopping early
+VALIDATION_INTERVAL = 10
+
+# How many validation checks in a row without improvement stop training
+PATIENCE = 10
+
+# The smallest change in validation AUC or loss that counts as an improvement
+VALIDATION_MIN_DELTA = 1e-4
+
+# How DatasetIterator builds batches ("copy", "buffered" or "prefetch")
+ITERATOR_MODE = "buffered"
+
+# The number of processes Sweep.py trains with (None uses every CPU)
+SWEEP_WORKERS = None
+
+# The file Sweep.py writes its results table to
+SWEEP_FILE = "sweep-results.csv"
+
+# The classifier proj1 runs: "nn" (the neural network), "split" (the linear
+# split on f1 + f2) or "knn" (nearest neighbours in the training graph)
+CLASSIFIER = "nn"
+
+# Libraries that should only be imported by the code paths that use them, and
+# the longest an entry point may take to import (in seconds, see ImportTimes)
+HEAVY_MODULES = ["tensorflow", "matplotlib", "sklearn", "pandas", "scipy"]
+IMPORT_TIME_BUDGET = 0.5
@@ -1,42 +1,26 @@
 from math import sqrt, log
+from functools import partial
 import numpy as np
 import pandas as pd
 from Constants import *
+from SimilarityEngine import similarityFeatures, parallelFeatures
+from NeighbourCache import NeighbourCache
+from MinHash import MinHashSketch
+from QueryPlanner import QueryPlan
+from FeatureRegistry import selectedFeatures
+from FeatureStore import FeatureStore
+from FeatureFile import saveFeatureBinary, exportFeatureCSV, binaryName
 from FileProcessor import processTrainingFile, processTestFile, \
                           processFeatureFile
 
 
 ################################################################################
 
-# Saves a given list of features to a file
-def saveFeatureFile(filename, x, y = None):
-
-    # Initialise header row
-    data = "Id"
-    for i in range(0, len(x[0])):
-        data += ",f{}".format(i + 1)
-
-    if (y is None):
-        data += "\n"
-    else:
-        data += ",label\n"
-
-    # Write instances as rows
-    for i in range(len(x)):
-
-        data += "{}".format(i)
-        for j in range(0, len(x[0])):
-            data += ",{}".format(x[i][j])
-
-        # Add label to last column if applicable
-        if (y is None):
-            data += "\n"
-        else:
-            data += ",{}\n".format(y[i])
-
-    file = open(filename, 'w')
-    file.write(data)
-    file.close()
+# Saves a given list of features in the binary format, with a CSV export
+# (columns are named f1, f2, ... unless names are given)
+def saveFeatureFile(filename, x, y = None, columns = None):
+    exportFeatureCSV(filename, x, y, columns)
+    saveFeatureBinary(binaryName(filename), x, y, columns, source = filename)
     print("File saved successfully.")
 
 ################################################################################
@@ -46,7 +30,18 @@ def saveFeatureFile(filename, x, y = None):
 # Output: a list which contains features for each pair in tuple (source feats 
 # + sink feats)
 
-def processFeatures(x, sourceDict, sinkDict, verbose = False):
+def processFeatures(x, sourceDict, sinkDict, verbose = False,
+                    batch = True, workers = WORKERS, sketch = None,
+                    store = None, names = None):
+
+    if (store is not None):
+        # Only compute the pairs the store has no features for yet
+        newX = store.compute(x, lambda pairs: processFeatures(
+                   pairs, sourceDict, sinkDict, verbose, batch, workers, sketch,
+                   names = names))
+        if (verbose):
+            print("Feature store: {}".format(store))
+        return [tuple(f) for f in newX.tolist()]
 
     newX = []
 
@@ -73,16 +68,53 @@ def processFeatures(x, sourceDict, sinkDict, verbose = False):
     f28 - Maximum similarity between sink and those who source follows (formula 7)
     '''
 
+    if (names is not None):
+        # Only compute what the named features (see FeatureRegistry) need
+        features = partial(selectedFeatures, names = names)
+    else:
+        features = similarityFeatures
 
-    for (source, sink) in x:
-        features = SourceAndSinkSimilarity(source, sink, sourceDict, sinkDict)
-        newX.append(features)
+    if (batch or sketch is not None or names is not None):
+        # Compute every pair at once with sparse products over the graph,
+        # split across processes if there are several workers. A MinHash
+        # sketch switches to approximate intersections
+        newX = parallelFeatures(x, sourceDict.graph, features, workers, sketch)
+        newX = [tuple(f) for f in newX.tolist()]
 
         if (verbose):
-            count += 1
             end = timer()
             print("Completed {} / {} ({:.2f} secs)"
-                  .format(count, total, end - start))
+                  .format(total, total, end - start))
+
+        return newX
+
+    # Popular nodes appear in many pairs, so only build their sets once
+    sourceCache = NeighbourCache(sourceDict)
+    sinkCache = NeighbourCache(sinkDict)
+
+    # Work through the pairs source by source, so each source's followings
+    # are fetched once, then put the results back in the original order
+    newX = [None for i in range(total)]
+
+    for (source, indexes) in QueryPlan(x).sourceGroups():
+        followings = sourceDict.get(source, [])
+
+        for i in indexes.tolist():
+            sink = x[i][1]
+            newX[i] = SourceAndSinkSimilarity(source, sink,
+                                              sourceDict, sinkDict,
+                                              sourceCache, sinkCache,
+                                              followings)
+
+            if (verbose):
+                count += 1
+                end = timer()
+                print("Completed {} / {} ({:.2f} secs)"
+                      .format(count, total, end - start))
+
+    if (verbose):
+        print("Source cache: {}".format(sourceCache))
+        print("Sink cache: {}".format(sinkCache))
 
     return newX
 
@@ -91,33 +123,49 @@ def processFeatures(x, sourceDict, sinkDict, verbose = False):
 # Calcualte the similarity between source and sink
 # Output: a tuple of features for (source, sink)
 
-def SourceAndSinkSimilarity(source, sink, sourceDict, sinkDict):
-    
-    followings = sourceDict.get(source, []).copy()
+def SourceAndSinkSimilarity(source, sink, sourceDict, sinkDict,
+                            sourceCache = None, sinkCache = None,
+                            followings = None):
+
+    if (sourceCache is None):
+        sourceCache = NeighbourCache(sourceDict)
+    if (sinkCache is None):
+        sinkCache = NeighbourCache(sinkDict)
+    if (followings is None):
+        followings = sourceDict.get(source, [])
+
+    followings = followings.copy()
     followers = sinkDict.get(sink, []).copy()
+    removed = False
     
     # remove the edge if existing
     try:
         followings.remove(sink)
         followers.remove(source)
+        removed = True
     except:
         pass
 
+    # The cached sets are only out of date if the edge was removed
+    followingSet = frozenset(followings) if (removed) \
+                   else sourceCache.get(source)
+    followerSet = frozenset(followers) if (removed) else sinkCache.get(sink)
+
     SourceSimilarities = pd.DataFrame(columns = ['s1', 's2', 's3', 's4', 's5', 's6', 's7'])
     SinkSimilarities = pd.DataFrame(columns = ['s1', 's2', 's3', 's4', 's5', 's6', 's7'])
 
 
     #source similarity
     for i,follower in enumerate(followers):
-        neighbourFollowings = sourceDict.get(follower, [])
+        neighbourFollowings = sourceCache.get(follower)
         SourceSimilarities.loc[i] = \
-            calcualteSimilarity(neighbourFollowings, followings)
+            calcualteSimilarity(neighbourFollowings, followingSet)
     
     #Sink Similarities
     for i,following in enumerate(followings):
-        neighbourFollowers = sinkDict.get(following, [])
+        neighbourFollowers = sinkCache.get(following)
         SinkSimilarities.loc[i] = \
-            calcualteSimilarity(neighbourFollowers, followers)
+            calcualteSimilarity(neighbourFollowers, followerSet)
     
     #output mean and max value in each column as features
     features = []
@@ -134,8 +182,8 @@ def SourceAndSinkSimilarity(source, sink, sourceDict, sinkDict):
 # similarity methods indexed corresponding to https://arxiv.org/pdf/0901.0553.pdf
 def calcualteSimilarity(x, y):
     # x, y should be non-empty set of neighbours
-    x = set(x)
-    y = set(y)
+    x = x if isinstance(x, (set, frozenset)) else set(x)
+    y = y if isinstance(y, (set, frozenset)) else set(y)
 
     if x and y:
         s1 = len(x & y)
@@ -151,29 +199,42 @@ def calcualteSimilarity(x, y):
 
 ################################################################################
 
-verbose = True
+# Creates new feature files from the training and test data (the pool of
+# feature workers needs this behind the __main__ guard, so that workers
+# started with spawn do not run it again)
+def main(verbose = True):
 
-sourceDict, sinkDict, xTrain, yTrain, xDev, yDev =\
-                        processTrainingFile(TRAIN_FILE, verbose = True)
+    sourceDict, sinkDict, xTrain, yTrain, xDev, yDev =\
+                            processTrainingFile(TRAIN_FILE, verbose = True)
 
-xTest = processTestFile(TEST_FILE)
+    xTest = processTestFile(TEST_FILE)
 
-# Creates new data files to use in place of the given ones
-# Convert files to our features
+    # Creates new data files to use in place of the given ones
+    # Convert files to our features
 
-start = timer()
-xTrain = processFeatures(xTrain, sourceDict, sinkDict, verbose = verbose)
-saveFeatureFile("training-features.txt", xTrain, yTrain)
-xDev = processFeatures(xDev, sourceDict, sinkDict, verbose = verbose)
-saveFeatureFile("development-features.txt", xDev, yDev)
-xTest = processFeatures(xTest, sourceDict, sinkDict, verbose = verbose)
-saveFeatureFile("test-features.txt", xTest)
-end = timer()
-
-if (verbose):
-    print("Time taken to process features: {:.2f} secs"
-              .format(end - start))
+    start = timer()
+    sketch = MinHashSketch(sourceDict.graph) if (APPROXIMATE) else None
+    names = SELECTED_FEATURES
+    store = FeatureStore(sourceDict.graph, "similarity", sketch, names) \
+            if (FEATURE_STORE_DIR is not None) else None
+    xTrain = processFeatures(xTrain, sourceDict, sinkDict, verbose = verbose,
+                             sketch = sketch, store = store, names = names)
+    saveFeatureFile("training-features.txt", xTrain, yTrain, names)
+    xDev = processFeatures(xDev, sourceDict, sinkDict, verbose = verbose,
+                           sketch = sketch, store = store, names = names)
+    saveFeatureFile("development-features.txt", xDev, yDev, names)
+    xTest = processFeatures(xTest, sourceDict, sinkDict, verbose = verbose,
+                            sketch = sketch, store = store, names = names)
+    saveFeatureFile("test-features.txt", xTest, None, names)
+    end = timer()
+
+    if (verbose):
+        print("Time taken to process features: {:.2f} secs"
+                  .format(end - start))
+
+    print("Feature files created successfully.")
 
-print("Feature files created successfully.")
+################################################################################
 
-################################################
+if (__name__ == "__main__"):
+    main()
@@ -0,0 +1,68 @@
+import numpy as np
+
+from Constants import *
+
+################################################################################
+
+class EarlyStopping:
+    """
+    Scores a validation set every `interval` epochs and remembers the
+    parameters with the best validation AUC (or, at the same AUC, the lowest
+    validation loss, since the AUC ignores calibration). Training should
+    stop once `patience` checks in a row have not improved either by more
+    than minDelta, and then restore the remembered parameters.
+    """
+    def __init__(self, xDev, yDev, interval = VALIDATION_INTERVAL,
+                 patience = PATIENCE, minDelta = VALIDATION_MIN_DELTA,
+                 verbose = True):
+        self.xDev = np.asarray(xDev, dtype=np.float64)
+        self.yDev = np.asarray(yDev, dtype=np.float64)
+        self.interval = interval
+        self.patience = patience
+        self.minDelta = minDelta
+        self.verbose = verbose
+        self.bestAUC = -np.inf
+        self.bestLoss = np.inf
+        self.bestEpoch = None
+        self.bestParameters = None
+        self.stale = 0
+
+    # Returns whether the validation set should be scored after this epoch
+    def due(self, epoch):
+        return (epoch + 1) % self.interval == 0
+
+    # Records the validation predictions after an epoch, keeping a copy of
+    # the parameters if they are the best so far, and returns True once
+    # training should stop (Evaluation is imported here so that importing
+    # the training code never pulls in its plotting and metric libraries)
+    def update(self, epoch, predictions, parameters):
+
+        from Evaluation import calculateAUC
+
+        predictions = np.asarray(predictions, dtype=np.float64)
+        loss = float(np.mean((predictions - self.yDev)**2))
+        auc = calculateAUC(self.yDev, predictions)
+
+        if (auc > self.bestAUC + self.minDelta
+            or (auc >= self.bestAUC and loss < self.bestLoss - self.minDelta)):
+            self.bestAUC = auc
+            self.bestLoss = loss
+            self.bestEpoch = epoch + 1
+            self.bestParameters = [np.array(p, copy=True) for p in parameters]
+            self.stale = 0
+        else:
+            self.stale += 1
+
+        if (self.verbose):
+            print("Validation after epoch {}: loss = {:.4f}, AUC = {:.4f}"
+                  .format(epoch + 1, loss, auc))
+
+        return self.stale >= self.patience
+
+    # Prints which epoch's parameters are being kept
+    def report(self):
+        if (self.verbose and self.bestEpoch is not None):
+            print("Restoring the parameters from epoch {} (AUC = {:.4f})"
+                  .format(self.bestEpoch, self.bestAUC))
+
+################################################################################
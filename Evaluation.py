@@ -1,16 +1,22 @@
-from matplotlib import pyplot as plt
-from sklearn.metrics import roc_auc_score
+import numpy as np
 
+from ConfidenceIntervals import bootstrapIntervals, delongInterval
 from Constants import *
 
 ################################################################################
 
-# Prints a summary of the results
-def evaluate(real, predictions):
+# Prints a summary of the results, with 95% confidence intervals (scikit-learn
+# is only imported when this runs)
+def evaluate(real, predictions, intervals = True):
+
+    from sklearn.metrics import roc_auc_score
+
     printAccuracy(real, predictions)
     AUC = roc_auc_score(real, predictions)
     print("AUC: {:.4f}".format(AUC))
     print("Mark = {:.1f} / 9".format(9 * max(min(AUC, 0.9) - 0.4, 0.0) / 0.5))
+    if (intervals):
+        printIntervals(real, predictions)
 
 ################################################################################
 
@@ -33,67 +39,105 @@ def printAccuracy(real, predictions):
 
 ################################################################################
 
-# Returns the AUC for the given true answers and predictions
+# Prints DeLong and bootstrap confidence intervals for the AUC and accuracy
+def printIntervals(real, predictions, alpha = 0.05):
+
+    auc, low, high = delongInterval(real, predictions, alpha)
+    print("AUC {:.0f}% CI (DeLong): [{:.4f}, {:.4f}]"
+          .format(100 * (1 - alpha), low, high))
+
+    bootstrap = bootstrapIntervals(real, predictions, alpha = alpha)
+    print("AUC {:.0f}% CI (bootstrap): [{:.4f}, {:.4f}]"
+          .format(100 * (1 - alpha), *bootstrap["AUC"]))
+    print("Accuracy {:.0f}% CI (bootstrap): [{:.2f}%, {:.2f}%]"
+          .format(100 * (1 - alpha), *[100 * a for a in bootstrap["Accuracy"]]))
+
+################################################################################
+
+# Returns the AUC for the given true answers and predictions, using the exact
+# ROC curve (this agrees with roc_auc_score)
 def calculateAUC(real, predictions, plotAUC = False):
     
     fprs, tprs = getRates(real, predictions)
 
-    auc = 0.0
-    i = 1
-    lastIndex = 0
-    
-    for i in range(len(tprs)):
-        if (tprs[i] != tprs[lastIndex]):
-            auc += tprs[lastIndex] * (fprs[lastIndex] - fprs[i])
-            lastIndex = i
-    auc += tprs[lastIndex] * (1.0 - fprs[lastIndex])
+    # Trapezoids between consecutive points, so tied scores count as half
+    auc = np.sum(np.diff(fprs) * (tprs[1:] + tprs[:-1]) / 2)
 
     if (plotAUC):
+        from matplotlib import pyplot as plt
         plt.plot(fprs, tprs)
         plt.show()
     
-    return auc
+    return float(auc)
 
 ################################################################################
 
-# Returns the list of true positive and false positive rates for the given data
-def getRates(real, predictions, n = 1000):
+# Returns the false positive and true positive rates for the given data, at
+# every distinct prediction (or at the n thresholds i / n if n is given)
+def getRates(real, predictions, n = None):
 
-    step = 1.0 / n
-    fprs, tprs = [], []
-    
-    for i in range(n):
-
-        # Convert to definitive answers based on this level of confidence
-        preds = [REAL if predictions[j] > (i * step) else FAKE
-                 for j in range(len(predictions))]
-        
-        TP, FP, FN, TN = getConfusionMatrix(real, preds)
-        
-        FPR = FP / (FP + TN)
-        TPR = TP / (TP + FN)
-
-        fprs.append(FPR)
-        tprs.append(TPR)
-        
+    if (n is not None):
+        TP, FP, FN, TN = getConfusionMatrix(real, predictions,
+                                            np.arange(n) / n)
+        return FP / (FP + TN), TP / (TP + FN)
+
+    fprs, tprs, thresholds = getROC(real, predictions)
     return fprs, tprs
 
 ################################################################################
 
-# Returns a confusion matrix based on the given true answers and predictions
-def getConfusionMatrix(real, predictions):
+# Returns the exact ROC curve as arrays of (FPR, TPR, threshold), with one
+# point per distinct prediction from the highest down, found by sorting once.
+# Like roc_auc_score, this raises ValueError unless both classes are present
+def getROC(real, predictions):
 
-    TP, FP, FN, TN = 0, 0, 0, 0
-    
-    for i in range(len(real)):
-        if (real[i] == 1 and predictions[i] == 1):
-            TP += 1
-        elif (real[i] == 0 and predictions[i] == 1):
-            FP += 1
-        elif (real[i] == 1 and predictions[i] == 0):
-            FN += 1
-        else:
-            TN += 1
+    real = np.asarray(real)
+    predictions = np.asarray(predictions, dtype=np.float64)
+    if (not np.any(real == REAL) or np.all(real == REAL)):
+        raise ValueError("The ROC curve needs instances of both classes")
+
+    order = np.argsort(-predictions, kind='mergesort')
+    predictions = predictions[order]
+    positive = real[order] == REAL
+
+    # Tied predictions move the curve together, so only keep the last of each
+    ends = np.append(np.flatnonzero(np.diff(predictions)), len(predictions) - 1)
+    TP = np.cumsum(positive)[ends]
+    FP = ends + 1 - TP
+
+    tprs = np.append(0.0, TP / TP[-1])
+    fprs = np.append(0.0, FP / FP[-1])
+    thresholds = np.append(np.inf, predictions[ends])
+
+    return fprs, tprs, thresholds
 
 ################################################################################
+
+# Returns a confusion matrix based on the given true answers and predictions.
+# Given a vector of thresholds, a prediction counts as REAL if it is above the
+# threshold, and arrays of counts (one per threshold) are returned
+def getConfusionMatrix(real, predictions, thresholds = None):
+
+    real = np.asarray(real) == REAL
+    predictions = np.asarray(predictions)
+
+    if (thresholds is None):
+        predicted = predictions == REAL
+        TP = int(np.sum(real & predicted))
+        FP = int(np.sum(~real & predicted))
+        FN = int(np.sum(real & ~predicted))
+        TN = len(real) - TP - FP - FN
+        return TP, FP, FN, TN
+
+    # Count how many of each class lie above every threshold at once
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    positives = np.sort(predictions[real])
+    negatives = np.sort(predictions[~real])
+    TP = len(positives) - np.searchsorted(positives, thresholds, side='right')
+    FP = len(negatives) - np.searchsorted(negatives, thresholds, side='right')
+    FN = len(positives) - TP
+    TN = len(negatives) - FP
+
     return TP, FP, FN, TN
+
+################################################################################
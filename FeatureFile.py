@@ -0,0 +1,178 @@
+import os
+import json
+
+import numpy as np
+
+from Constants import *
+from CSVWriter import writeCSV
+
+# The first bytes of every binary feature file
+MAGIC = b"FEATURES"
+
+# Bump this when the binary layout changes
+FORMAT_VERSION = 1
+
+# The feature matrix and labels start on multiples of this many bytes
+ALIGNMENT = 64
+
+################################################################################
+
+# Saves features (and labels, if given) in the binary format: the magic bytes,
+# the header length, a JSON header, then the feature matrix column by column
+# and the labels, each aligned so they can be memory-mapped. Given the CSV
+# file it copies, its size and modification time are kept in the header
+def saveFeatureBinary(filename, x, y = None, columns = None,
+                      dtype = np.float64, source = None):
+
+    x = featureMatrix(x, dtype)
+    if (columns is None):
+        columns = featureColumns(x.shape[1])
+    assert(len(columns) == x.shape[1])
+
+    header = {"version": FORMAT_VERSION, "rows": x.shape[0],
+              "columns": list(columns), "dtype": x.dtype.str,
+              "labels": None if (y is None) else "<i8",
+              "source": None if (source is None) else sourceStamp(source)}
+    header = json.dumps(header).encode()
+    offset = align(len(MAGIC) + 8 + len(header))
+
+    with open(filename, 'wb') as file:
+        file.write(MAGIC)
+        file.write(np.uint64(len(header)).tobytes())
+        file.write(header.ljust(offset - len(MAGIC) - 8))
+        file.write(np.asfortranarray(x).tobytes(order = 'F'))
+
+        if (y is not None):
+            file.write(b"\0" * (align(file.tell()) - file.tell()))
+            file.write(np.asarray(y, dtype="<i8").tobytes())
+
+################################################################################
+
+# Loads a binary feature file as arrays memory-mapped from the file (copied
+# into memory if mmapMode is None), returning x, y like processFeatureFile
+def loadFeatureBinary(filename, mmapMode = 'r', columns = False):
+
+    header, offset = readHeader(filename)
+    rows, names = header["rows"], header["columns"]
+    dtype = np.dtype(header["dtype"])
+
+    x = loadArray(filename, dtype, (rows, len(names)), offset, 'F', mmapMode)
+
+    result = (x,)
+    if (header["labels"] is not None):
+        offset = align(offset + x.nbytes)
+        y = loadArray(filename, np.dtype(header["labels"]), (rows,), offset,
+                      'C', mmapMode)
+        result += (y,)
+    if (columns):
+        result += (names,)
+
+    return result if (len(result) > 1) else result[0]
+
+################################################################################
+
+# Returns the header of a binary feature file and where its data starts
+def readHeader(filename):
+
+    with open(filename, 'rb') as file:
+        if (file.read(len(MAGIC)) != MAGIC):
+            raise ValueError("{} is not a binary feature file".format(filename))
+        length = int(np.frombuffer(file.read(8), dtype=np.uint64)[0])
+        header = json.loads(file.read(length).decode())
+
+    if (header["version"] != FORMAT_VERSION):
+        raise ValueError("{} has unsupported version {}"
+                         .format(filename, header["version"]))
+
+    return header, align(len(MAGIC) + 8 + length)
+
+################################################################################
+
+# Returns an array stored at the given offset of a file
+def loadArray(filename, dtype, shape, offset, order, mmapMode):
+
+    if (np.prod(shape) == 0):
+        return np.zeros(shape, dtype=dtype, order=order)
+    if (mmapMode is not None):
+        return np.memmap(filename, dtype=dtype, mode=mmapMode, offset=offset,
+                         shape=shape, order=order)
+
+    with open(filename, 'rb') as file:
+        file.seek(offset)
+        data = np.fromfile(file, dtype=dtype, count=int(np.prod(shape)))
+    return data.reshape(shape, order = order)
+
+################################################################################
+
+# Exports features (and labels) to the CSV format read by processFeatureFile
+# and LogitClassifier.R
+def exportFeatureCSV(filename, x, y = None, columns = None):
+
+    x = featureMatrix(x, np.float64)
+    if (columns is None):
+        columns = featureColumns(x.shape[1])
+
+    header = ",".join(["Id"] + list(columns))
+    data = [range(len(x)), x]
+    if (y is not None):
+        header += ",label"
+        data.append(np.asarray(y))
+
+    writeCSV(filename, header, data)
+
+################################################################################
+
+# Returns the features as a 2D array with one row per instance
+def featureMatrix(x, dtype):
+    x = np.asarray(x, dtype=dtype)
+    return x.reshape(len(x), x.size // max(len(x), 1))
+
+################################################################################
+
+# Returns the binary file that goes with a CSV feature file
+def binaryName(filename):
+    return os.path.splitext(filename)[0] + FEATURE_BINARY_SUFFIX
+
+################################################################################
+
+# Returns the binary copy to load for a feature file (the file itself if it
+# is binary), or None if there is none made from the CSV as it is now
+def currentBinary(filename):
+
+    binary = binaryName(filename)
+    if (filename == binary):
+        return binary
+    if (not os.path.exists(binary)):
+        return None
+    if (not os.path.exists(filename)):
+        return binary
+
+    # Compare the CSV with the one the binary was made from, which does not
+    # depend on which of the two was written last
+    try:
+        header, offset = readHeader(binary)
+    except ValueError:
+        return None
+
+    return binary if (header.get("source") == sourceStamp(filename)) else None
+
+################################################################################
+
+# Returns the size and modification time (in nanoseconds) of a file
+def sourceStamp(filename):
+    stat = os.stat(filename)
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+################################################################################
+
+# Returns the default column names f1, f2, ...
+def featureColumns(n):
+    return ["f{}".format(i + 1) for i in range(n)]
+
+################################################################################
+
+# Rounds an offset up to the next multiple of ALIGNMENT
+def align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+################################################################################
@@ -1,11 +1,25 @@
 from math import sqrt
+from functools import partial
 
 from Constants import *
+from SimilarityEngine import diceFeatures, parallelFeatures
+from FeatureRegistry import selectedFeatures
 
 ################################################################################
 
 # Converts the given x data to our features
-def processFeatures(x, sourceDict, sinkDict, verbose = False):
+def processFeatures(x, sourceDict, sinkDict, verbose = False,
+                    batch = True, workers = WORKERS, sketch = None,
+                    store = None, names = None):
+
+    if (store is not None):
+        # Only compute the pairs the store has no features for yet
+        newX = store.compute(x, lambda pairs: processFeatures(
+                   pairs, sourceDict, sinkDict, verbose, batch, workers, sketch,
+                   names = names))
+        if (verbose):
+            print("Feature store: {}".format(store))
+        return [tuple(f) for f in newX.tolist()]
 
     newX = []
 
@@ -28,6 +42,26 @@ def processFeatures(x, sourceDict, sinkDict, verbose = False):
     f7 - Maximum similarity between sink and those who source follows
     f8 - 1.0 / average similarity, which is used in exponential distributions
     '''
+    if (names is not None):
+        # Only compute what the named features (see FeatureRegistry) need
+        features = partial(selectedFeatures, names = names)
+    else:
+        features = diceFeatures
+
+    if (batch or sketch is not None or names is not None):
+        # Compute every pair at once with sparse products over the graph,
+        # split across processes if there are several workers. A MinHash
+        # sketch switches to approximate intersections
+        newX = parallelFeatures(x, sourceDict.graph, features, workers, sketch)
+        newX = [tuple(f) for f in newX.tolist()]
+
+        if (verbose):
+            end = timer()
+            print("Completed {} / {} ({:.2f} secs)"
+                  .format(total, total, end - start))
+
+        return newX
+
     for (source, sink) in x:
         sourceFeats = sourceSimilarity(source, sink, sourceDict, sinkDict)
         sinkFeats = sinkSimilarity(source, sink, sourceDict, sinkDict)
@@ -0,0 +1,185 @@
+import numpy as np
+
+from Constants import *
+from SimilarityEngine import densePairs, pairBatches, sideTerms, \
+                             similarityMetrics, diceStatistics, meanAndMax
+
+'''
+A registry of every feature column the feature scripts can produce, so a run
+can ask for a subset and only compute what that subset needs.
+
+Each feature reads one side of a (source, sink) pair:
+    source - the source's followings against those who follow sink
+    sink   - the sink's followers against those the source follows
+computes one per-neighbour similarity metric over that side's terms, then
+summarises it per pair:
+    meanAndMax     - [mean, max] as in CreateFeatureFile (edge removed)
+    diceStatistics - [mean, std, max, 1 / mean] of the Dice similarity as in
+                     FeatureProcessor (edge kept)
+
+Its inputs are the intermediates it needs, each with a relative cost: the
+side's intersection terms dominate, then one column per metric and summary.
+'''
+
+# The relative cost of each kind of intermediate
+COSTS = {"terms": 20, "metric": 1, "summary": 1}
+
+# The names of the metrics of similarityMetrics, plus the Dice similarity as
+# FeatureProcessor computes it
+METRIC_NAMES = ["common", "salton", "jaccard", "sorensen", "hubPromoted",
+                "hubDepressed", "leichtHolmeNewman"]
+DICE = "dice"
+
+################################################################################
+
+class Feature:
+    """
+    One feature column: the side of the pair it reads, whether the pair's
+    own edge is removed first, the metric it summarises, and which column of
+    which per-pair summary it is (side is None if nothing in this tree
+    produces the feature)
+    """
+    def __init__(self, name, description, side = None, removeEdge = True,
+                 metric = None, summary = None, column = 0):
+        self.name = name
+        self.description = description
+        self.side = side
+        self.removeEdge = removeEdge
+        self.metric = metric
+        self.summary = summary
+        self.column = column
+
+    # Returns whether the feature can be computed
+    def available(self):
+        return self.side is not None
+
+    # Returns the intermediates the feature needs, as (kind, key) tuples
+    def inputs(self):
+        terms = (self.side, self.removeEdge)
+        return [("terms", terms), ("metric", terms + (self.metric,)),
+                ("summary", terms + (self.metric, self.summary))]
+
+    def __repr__(self):
+        return "Feature({})".format(self.name)
+
+################################################################################
+
+# Returns every registered feature by name, in file column order
+def buildRegistry():
+
+    registry = {}
+
+    # f1 - f10 are in the committed feature files, but no code in this tree
+    # writes them
+    for i in range(1, 11):
+        name = "f{}".format(i)
+        registry[name] = Feature(name, "Not produced by any code in this tree")
+
+    # f11 - f38: [mean, max] of each metric, source side then sink side
+    i = 11
+    for side, compared in [("source", "those who follow sink"),
+                           ("sink", "those source follows")]:
+        for metric, metricName in enumerate(METRIC_NAMES):
+            for column, statistic in enumerate(["Average", "Maximum"]):
+                name = "f{}".format(i)
+                description = "{} {} similarity between {} and {}" \
+                              .format(statistic, metricName, side, compared)
+                registry[name] = Feature(name, description, side, True,
+                                         metric, "meanAndMax", column)
+                i += 1
+
+    # The Dice statistics of FeatureProcessor
+    for side in ["source", "sink"]:
+        for column, statistic in enumerate(["Mean", "Std", "Max", "Inverse"]):
+            name = "{}Dice{}".format(side, statistic)
+            description = "{} of the Dice similarity on the {} side" \
+                          .format(statistic, side)
+            registry[name] = Feature(name, description, side, False,
+                                     DICE, "diceStatistics", column)
+
+    return registry
+
+REGISTRY = buildRegistry()
+
+# The features CreateFeatureFile and FeatureProcessor compute in full
+SIMILARITY_FEATURES = ["f{}".format(i) for i in range(11, 39)]
+DICE_FEATURES = [name for name in REGISTRY if ("Dice" in name)]
+
+################################################################################
+
+# Returns the registered features with the given names, checking that they
+# can all be computed
+def lookupFeatures(names):
+
+    features = []
+    for name in names:
+        if (name not in REGISTRY):
+            raise ValueError("Unknown feature: {}".format(name))
+        if (not REGISTRY[name].available()):
+            raise ValueError("Feature {} is not produced by any code in this "
+                             "tree".format(name))
+        features.append(REGISTRY[name])
+
+    return features
+
+################################################################################
+
+# Returns the relative cost of computing the named features together, with
+# shared intermediates counted once
+def featureCost(names):
+
+    inputs = set()
+    for feature in lookupFeatures(names):
+        inputs.update(feature.inputs())
+
+    return sum(COSTS[kind] for kind, key in inputs)
+
+################################################################################
+
+# Returns the named features per pair, computing only the sides, metrics and
+# summaries they need. Use with functools.partial(..., names = names) to pass
+# it to parallelFeatures
+def selectedFeatures(x, graph, sketch = None, names = SIMILARITY_FEATURES):
+
+    features = lookupFeatures(names)
+    sources, sinks = densePairs(x, graph)
+    result = np.zeros((len(sources), len(features)))
+
+    # Group the wanted columns by the side terms they share
+    plan = {}
+    for i, feature in enumerate(features):
+        plan.setdefault((feature.side, feature.removeEdge), []) \
+            .append((i, feature))
+
+    for (side, removeEdge), wanted in plan.items():
+        sourceSide = side == "source"
+        queries, anchors = (sources, sinks) if (sourceSide) \
+                           else (sinks, sources)
+        metrics = sorted(set(feature.metric for i, feature in wanted
+                             if (feature.metric != DICE)))
+
+        # Pairs sharing an anchor are batched together so they share work
+        order = np.argsort(anchors, kind='stable')
+
+        for batch in pairBatches(graph, anchors[order], sourceSide):
+            rows = order[batch]
+            pairs, intersect, nx, ny = sideTerms(graph, queries[rows],
+                                                 anchors[rows], sourceSide,
+                                                 removeEdge, sketch)
+            similarities = similarityMetrics(intersect, nx, ny, metrics)
+            summaries = {}
+
+            for i, feature in wanted:
+                key = (feature.metric, feature.summary)
+                if (key not in summaries):
+                    if (feature.metric == DICE):
+                        dice = (2 * intersect) / (nx + ny)
+                        summaries[key] = diceStatistics(dice, pairs, len(rows))
+                    else:
+                        column = similarities[:, [metrics.index(feature.metric)]]
+                        summaries[key] = meanAndMax(column, pairs, len(rows))
+                result[rows, i] = summaries[key][:, feature.column]
+
+    return result
+
+################################################################################
@@ -0,0 +1,168 @@
+import os
+import time
+import hashlib
+
+import numpy as np
+
+from Constants import *
+
+# Bump this when a feature's definition changes so old rows are ignored
+STORE_VERSION = 1
+
+################################################################################
+
+class FeatureStore:
+    """
+    A persistent store of computed feature rows keyed by (graph fingerprint,
+    feature set version, source, sink). Rows live in immutable segments of
+    sorted pair keys and their feature values under
+    directory/<fingerprint>/<version>/, so lookups are binary searches and
+    new rows are appended as new segments. Segments are merged once there
+    are more than FEATURE_STORE_SEGMENTS of them.
+    """
+    def __init__(self, graph, name, sketch = None, names = None,
+                 directory = FEATURE_STORE_DIR):
+        self.version = featureVersion(name, sketch, names)
+        self.directory = os.path.join(directory, graph.fingerprint()[:16],
+                                      self.version)
+        os.makedirs(self.directory, exist_ok = True)
+        self.found = 0
+        self.computed = 0
+
+    # Returns feature rows for the (source, sink) pairs, computing only the
+    # pairs not already stored with function(pairs) and storing them
+    def compute(self, x, function):
+
+        keys, inverse = np.unique(pairKeys(x), return_inverse = True)
+        values, found = self.lookup(keys)
+        missing = keys[~found]
+
+        if (len(missing) > 0):
+            computed = np.asarray(function(pairList(missing)),
+                                  dtype=np.float64).reshape(len(missing), -1)
+            self.append(missing, computed)
+            if (values is None):
+                values = np.empty((len(keys), computed.shape[1]))
+            values[~found] = computed
+
+        self.found += int(found.sum())
+        self.computed += len(missing)
+
+        if (values is None):
+            return np.empty((len(inverse), 0))
+        return values[inverse.reshape(-1)]
+
+    # Returns the stored rows for an array of pair keys (None if the store is
+    # empty) and which keys were found
+    def lookup(self, keys):
+
+        values = None
+        found = np.zeros(len(keys), dtype=bool)
+
+        for segmentKeys, segmentValues in self.segments():
+            if (values is None):
+                values = np.empty((len(keys), segmentValues.shape[1]))
+
+            positions = np.searchsorted(segmentKeys, keys)
+            positions[positions == len(segmentKeys)] = 0
+            hits = (segmentKeys[positions] == keys) & ~found
+            values[hits] = segmentValues[positions[hits]]
+            found |= hits
+
+        return values, found
+
+    # Stores feature rows for an array of pair keys as a new segment
+    def append(self, keys, values):
+
+        order = np.argsort(keys, kind='stable')
+        name = "segment-{}-{}".format(time.time_ns(), os.getpid())
+        self.writeSegment(name, keys[order], values[order])
+
+        if (len(self.segmentNames()) > FEATURE_STORE_SEGMENTS):
+            self.compact()
+
+    # Merges every segment into one, keeping the first row of each pair
+    def compact(self):
+
+        names = self.segmentNames()
+        segments = [self.readSegment(name) for name in names]
+        keys = np.concatenate([keys for keys, values in segments])
+        values = np.concatenate([values for keys, values in segments])
+        keys, first = np.unique(keys, return_index = True)
+
+        self.writeSegment("segment-{}-{}".format(time.time_ns(), os.getpid()),
+                          keys, values[first])
+        for name in names:
+            for suffix in [".keys.npy", ".values.npy"]:
+                try:
+                    os.remove(os.path.join(self.directory, name + suffix))
+                except FileNotFoundError:
+                    pass
+
+    # Yields the (keys, values) of each segment, memory-mapped
+    def segments(self):
+        for name in self.segmentNames():
+            yield self.readSegment(name)
+
+    # Returns the names of the complete segments, oldest first
+    def segmentNames(self):
+        return sorted(name[:-len(".keys.npy")]
+                      for name in os.listdir(self.directory)
+                      if name.endswith(".keys.npy"))
+
+    # Returns the memory-mapped keys and values of a segment
+    def readSegment(self, name):
+        path = os.path.join(self.directory, name)
+        return (np.load(path + ".keys.npy", mmap_mode = 'r'),
+                np.load(path + ".values.npy", mmap_mode = 'r'))
+
+    # Writes a segment, renaming the keys into place last so readers only
+    # see complete segments
+    def writeSegment(self, name, keys, values):
+        path = os.path.join(self.directory, name)
+        for suffix, array in [(".values.npy", values), (".keys.npy", keys)]:
+            tmp = path + suffix + ".tmp"
+            with open(tmp, 'wb') as file:
+                np.save(file, array)
+            os.replace(tmp, path + suffix)
+
+    # Returns how many rows were found and computed, for verbose output
+    def __str__(self):
+        return "{} rows found, {} computed ({})".format(self.found,
+                                                        self.computed,
+                                                        self.directory)
+
+################################################################################
+
+# Returns the version string of a feature set, including the selected
+# feature names (if only some are computed) and the MinHash parameters (if
+# they are estimated from a sketch)
+def featureVersion(name, sketch = None, names = None):
+
+    version = "{}-v{}".format(name, STORE_VERSION)
+    if (names is not None):
+        sha1 = hashlib.sha1(",".join(names).encode())
+        version += "-{}".format(sha1.hexdigest()[:8])
+    if (sketch is not None):
+        sha1 = hashlib.sha1(sketch.a.tobytes() + sketch.b.tobytes())
+        version += "-minhash{}-{}".format(sketch.length, sha1.hexdigest()[:8])
+
+    return version
+
+################################################################################
+
+# Packs (source, sink) pairs of non-negative 32-bit node IDs into int64 keys
+def pairKeys(x):
+
+    x = np.asarray(x, dtype=np.int64).reshape(-1, 2)
+    assert(np.all((x >= 0) & (x < 1 << 31)))
+
+    return (x[:, 0] << 32) | x[:, 1]
+
+################################################################################
+
+# Unpacks int64 keys into a list of (source, sink) tuples
+def pairList(keys):
+    return list(zip((keys >> 32).tolist(), (keys & 0xFFFFFFFF).tolist()))
+
+################################################################################
@@ -1,15 +1,37 @@
-from random import choice as random, shuffle
+import numpy as np
 
 from Constants import *
+from FeatureFile import loadFeatureBinary, currentBinary
+from Graph import Graph, sortedContains
+from GraphCache import loadTrainingCache, saveTrainingCache
+
+# The place values of each digit in a (signed 64-bit) integer
+POWERS_OF_TEN = 10 ** np.arange(19, dtype=np.int64)
 
 ################################################################################
 
 # Takes the training file and returns lists of training and test edges
-def processTrainingFile(file, verbose = False):
+def processTrainingFile(file, verbose = False, cache = True, seed = None):
+
+    cached = loadTrainingCache(file, seed, verbose) if (cache) else None
+
+    if (cached is not None):
+        graph, trainReal, devReal, trainFake, devFake = cached
+        sourceDict = graph.sourceDict
+        sinkDict = graph.sinkDict
+        trainReal, devReal, trainFake, devFake = \
+                   [list(map(tuple, edges.tolist()))
+                    for edges in (trainReal, devReal, trainFake, devFake)]
+    else:
+        trainReal, devReal, sourceDict, sinkDict = \
+                   getEdges(file, verbose, seed)
+        trainFake, devFake = getFakeEdges(sourceDict, sinkDict,
+                                          len(trainReal) + len(devReal), seed)
 
-    trainReal, devReal, sourceDict, sinkDict = getEdges(file, verbose)
-    trainFake, devFake = \
-               getFakeEdges(sourceDict, sinkDict, len(trainReal) + len(devReal))
+        if (cache):
+            saveTrainingCache(file, seed, sourceDict.graph,
+                              trainReal, devReal, trainFake, devFake,
+                              verbose)
 
     xTrain = trainReal + trainFake
     yTrain = [REAL for i in range(len(trainReal))] \
@@ -24,42 +46,28 @@ def processTrainingFile(file, verbose = False):
 ################################################################################
 
 # Processes a file and returns a list and dictionary detailing the edges
-def getEdges(file, verbose):
-
-    data = open(file, 'r')
-    nodes = []
-    edges = []
-
-    for line in data.readlines():
-        line = line.split("\t")
-        source = int(line[0])
-        sinks = line[1:]
-        for sink in sinks:
-            sink = int(sink)
-            edges.append((source, sink))
-            nodes.append(sink)
-        nodes.append(source)
+def getEdges(file, verbose, seed = None):
+
+    sources, sinks = readEdgeArrays(file)
+    graph = Graph.fromEdges(sources, sinks)
+    numEdges = len(sources)
+    del sources, sinks
 
     if (verbose):
-        print("Number of nodes: {}".format(len(list(set(nodes)))))
-        print("Number of edges: {}".format(len(edges)))    
+        print("Number of nodes: {}".format(graph.numNodes))
+        print("Number of edges: {}".format(numEdges))
 
     # Randomise edges and reduce to appropriate sizes
-    shuffle(edges)
-    trainReal = edges[:TRAINING_LIMIT]
-    devReal = edges[-DEV_LIMIT:]
+    sample = np.random.default_rng(seed).choice(
+        numEdges, min(numEdges, TRAINING_LIMIT + DEV_LIMIT), replace = False)
+    trainReal = edgeList(graph, sample[:TRAINING_LIMIT])
+    devReal = edgeList(graph, sample[-DEV_LIMIT:])
 
     # Our dictionaries should be unaware of the development data
     #edges = edges[:-DEV_LIMIT]
 
-    sourceDict = {}
-    sinkDict = {}
-    
-    for (source, sink) in edges:
-        sourceDict[source] = sourceDict.get(source, [])
-        sourceDict[source].append(sink)
-        sinkDict[sink] = sinkDict.get(sink, [])
-        sinkDict[sink].append(source)
+    sourceDict = graph.sourceDict
+    sinkDict = graph.sinkDict
 
     if (verbose):
         print("sourceDict contains {} keys".format(len(sourceDict.keys())))
@@ -69,24 +77,131 @@ def getEdges(file, verbose):
 
 ################################################################################
 
+# Returns the given CSR edge positions as a list of (source, sink) tuples
+def edgeList(graph, positions):
+
+    sources = np.searchsorted(graph.outIndptr, positions, side = 'right') - 1
+    sinks = graph.outIndices[positions]
+
+    return list(zip(graph.nodeIds[sources].tolist(),
+                    graph.nodeIds[sinks].tolist()))
+
+################################################################################
+
+# Reads an adjacency-list file (source, then its sinks) into edge arrays
+def readEdgeArrays(file):
+
+    sourceChunks = []
+    sinkChunks = []
+
+    for values, first in readIntegerChunks(file):
+        # Each token belongs to the source that started its line
+        line = np.cumsum(first) - 1
+        sinks = ~first
+        sourceChunks.append(values[first][line[sinks]])
+        sinkChunks.append(values[sinks])
+
+    sources = np.concatenate(sourceChunks) if (sourceChunks) \
+              else np.zeros(0, dtype=np.int64)
+    del sourceChunks
+    sinks = np.concatenate(sinkChunks) if (sinkChunks) \
+            else np.zeros(0, dtype=np.int64)
+
+    return sources, sinks
+
+################################################################################
+
+# Yields (values, first) arrays for each chunk of whole lines in a file, where
+# first marks the tokens that start a line
+def readIntegerChunks(file, skipHeader = False):
+
+    with open(file, 'rb') as data:
+        if (skipHeader):
+            data.readline()
+
+        remainder = b""
+        while True:
+            chunk = data.read(CHUNK_SIZE)
+            if (not chunk):
+                break
+
+            # Only parse whole lines, carrying the last partial one over
+            chunk = remainder + chunk
+            end = chunk.rfind(b"\n") + 1
+            remainder = chunk[end:]
+            if (end > 0):
+                yield parseIntegers(chunk[:end])
+
+        if (remainder.strip()):
+            yield parseIntegers(remainder + b"\n")
+
+################################################################################
+
+# Parses every non-negative integer in a block of whole lines at once
+def parseIntegers(chunk):
+
+    buf = np.frombuffer(chunk, dtype=np.uint8)
+    digit = (buf >= ord("0")) & (buf <= ord("9"))
+
+    # Tokens are runs of digits
+    change = np.diff(digit.astype(np.int8), prepend = 0, append = 0)
+    starts = np.flatnonzero(change == 1)
+    ends = np.flatnonzero(change == -1)
+    lengths = ends - starts
+
+    # Weight each digit by its place value within its token
+    positions = np.flatnonzero(digit)
+    del digit, change
+    place = np.repeat(ends - 1, lengths) - positions
+    values = (buf[positions] - ord("0")).astype(np.int64) * POWERS_OF_TEN[place]
+    del place, positions
+    offsets = np.zeros(len(starts), dtype=np.int64)
+    np.cumsum(lengths[:-1], out = offsets[1:])
+    values = np.add.reduceat(values, offsets) if (len(starts)) else values
+
+    # A token starts a line if no newline separates it from the previous one
+    lines = np.searchsorted(np.flatnonzero(buf == ord("\n")), starts)
+    first = np.ones(len(starts), dtype=bool)
+    first[1:] = lines[1:] != lines[:-1]
+
+    return values, first
+
+################################################################################
+
 # Returns a list of N fake edges that do not exist in the training or test data
-def getFakeEdges(sourceDict, sinkDict, n):
+def getFakeEdges(sourceDict, sinkDict, n, seed = None):
 
-    fakeEdges = []
+    graph = sourceDict.graph
+    rng = np.random.default_rng(seed)
 
     # Make a list of all nodes that appear in the training data
-    potentialSources = list(sourceDict.keys())
-    potentialSinks = list(sinkDict.keys())
+    potentialSources = sourceDict.denseKeys()
+    potentialSinks = sinkDict.denseKeys()
+
+    # Pairs are compared as sorted keys of source * numNodes + sink
+    existing = graph.edgeKeys()
+    chosen = np.zeros(0, dtype=np.int64)
+
+    while (len(chosen) < n):
+        size = max(2 * (n - len(chosen)), 1024)
+        sources = rng.integers(len(potentialSources), size = size)
+        sources = potentialSources[sources]
+        sinks = potentialSinks[rng.integers(len(potentialSinks), size = size)]
+        keys = sources.astype(np.int64) * graph.numNodes + sinks
 
-    while (len(fakeEdges) < n):
-        source = random(potentialSources)
-        sink = random(potentialSinks)
+        # Make sure it isn't an edge nor following itself
+        keys = keys[(sources != sinks) & ~sortedContains(existing, keys)]
 
-        # Make sure it isn't duplicate nor following itself
-        if (source != sink and sink not in sourceDict[source]
-            and (source, sink) not in fakeEdges):
+        # Make sure it isn't duplicate, keeping the order they were drawn in
+        _, firsts = np.unique(keys, return_index = True)
+        keys = keys[np.sort(firsts)]
+        keys = keys[~np.isin(keys, chosen)]
 
-            fakeEdges.append((source, sink))
+        chosen = np.concatenate((chosen, keys[:n - len(chosen)]))
+
+    sources = graph.nodeIds[chosen // graph.numNodes]
+    sinks = graph.nodeIds[chosen % graph.numNodes]
+    fakeEdges = list(zip(sources.tolist(), sinks.tolist()))
 
     trainFake = fakeEdges[:TRAINING_LIMIT]
     devFake = fakeEdges[-DEV_LIMIT:]
@@ -98,53 +213,67 @@ def getFakeEdges(sourceDict, sinkDict, n):
 # Returns the list of edges defined in the test file
 def processTestFile(file):
 
-    data = open(file, 'r')
+    sources, sinks = readTestArrays(file)
 
-    xTest = []
+    return list(zip(sources.tolist(), sinks.tolist()))
 
-    for line in data.readlines():
-        line = line.split("\t")
+################################################################################
 
-        try:
-            source = int(line[1])
-            sink = int(line[2])
-            xTest.append((source, sink))
+# Reads the (Id, Source, Sink) rows after the test file's header into arrays
+def readTestArrays(file):
 
-        # Header, ignore it
-        except:
-            continue
+    rows = [values for values, first in readIntegerChunks(file, True)]
+    rows = np.concatenate(rows).reshape(-1, 3) if (rows) \
+           else np.zeros((0, 3), dtype=np.int64)
 
-    return xTest
+    return rows[:, 1], rows[:, 2]
 
 ################################################################################
 
-# Loads a file containing features into lists of labels and features
+# Loads a file containing features into lists of labels and features. Binary
+# feature files (or a CSV with a binary copy made from it as it is now) are
+# loaded without parsing any text
 def processFeatureFile(filename):
 
+    binary = currentBinary(filename)
+    if (binary is not None):
+        return featureLists(loadFeatureBinary(binary, mmapMode = None))
+
     file = open(filename, 'r')
-    lines = file.readlines()[1:]
+    lines = file.readlines()
     x = []
     y = []
 
+    # The label is in the column headed "label" (test data has none), which
+    # is not always the one after the first FEATURES features
+    header = lines[0].strip("\n").split(",")
+    labelColumn = header.index("label") if ("label" in header) else None
+    lines = lines[1:]
+
     for line in lines:
         line = line.strip("\n")
         line = line.split(",")
         instance = tuple([float(line[i + 1]) for i in range(FEATURES)])
         x.append(instance)
-        
-        try:
-            label = int(line[FEATURES + 1])
-            y.append(label)
-        except:
-            # Test data has no labels
-            continue
+
+        if (labelColumn is not None):
+            y.append(int(line[labelColumn]))
 
     if (len(y) > 0):
         return x, y
     else:
         return x
 
+################################################################################
 
+# Converts loaded feature arrays to the lists of tuples processFeatureFile
+# returns for CSV files
+def featureLists(loaded):
 
+    if (isinstance(loaded, tuple)):
+        x, y = loaded
+        return featureLists(x), y.tolist()
 
+    return [tuple(row) for row in loaded[:, :FEATURES].tolist()]
 
+################################################################################
@@ -0,0 +1,248 @@
+import os
+import hashlib
+
+import numpy as np
+
+from Constants import *
+
+# The arrays that make up a graph, in constructor order
+GRAPH_ARRAYS = ["nodeIds", "outIndptr", "outIndices", "inIndptr", "inIndices"]
+
+################################################################################
+
+class Graph:
+    """
+    A directed graph stored as compressed sparse rows in both directions.
+    Node IDs are mapped to dense IDs in [0, numNodes) through the sorted
+    nodeIds array, so nodeIds[denseId] is the original node ID.
+    """
+    def __init__(self, nodeIds, outIndptr, outIndices, inIndptr, inIndices):
+        self.nodeIds = nodeIds
+        self.outIndptr = outIndptr
+        self.outIndices = outIndices
+        self.inIndptr = inIndptr
+        self.inIndices = inIndices
+        self.numNodes = len(nodeIds)
+        self.numEdges = len(outIndices)
+        self._edgeKeys = None
+        self._distinctOutDegree = None
+        self._fingerprint = None
+
+        # The directory the arrays are memory-mapped from, if any
+        self.directory = None
+
+        # Dict-compatible views for the existing feature code
+        self.sourceDict = AdjacencyView(self, outIndptr, outIndices)
+        self.sinkDict = AdjacencyView(self, inIndptr, inIndices)
+
+    # Builds a graph from two parallel arrays of (source, sink) node IDs
+    @classmethod
+    def fromEdges(cls, sources, sinks):
+
+        sources = np.asarray(sources, dtype=np.int64)
+        sinks = np.asarray(sinks, dtype=np.int64)
+
+        nodeIds = np.unique(np.concatenate((sources, sinks)))
+        dtype = np.int32 if (len(nodeIds) < 2**31) else np.int64
+        sources = np.searchsorted(nodeIds, sources).astype(dtype)
+        sinks = np.searchsorted(nodeIds, sinks).astype(dtype)
+
+        outIndptr, outIndices = compress(sources, sinks, len(nodeIds))
+        inIndptr, inIndices = compress(sinks, sources, len(nodeIds))
+
+        return cls(nodeIds, outIndptr, outIndices, inIndptr, inIndices)
+
+    # Saves the graph arrays as .npy files in the given directory
+    def save(self, directory):
+        for name in GRAPH_ARRAYS:
+            np.save(os.path.join(directory, name + ".npy"), getattr(self, name))
+
+    # Loads a saved graph, memory-mapping the arrays unless mmapMode is None
+    @classmethod
+    def load(cls, directory, mmapMode = 'r'):
+        arrays = [np.load(os.path.join(directory, name + ".npy"),
+                          mmap_mode = mmapMode)
+                  for name in GRAPH_ARRAYS]
+        graph = cls(*arrays)
+        if (mmapMode is not None):
+            graph.directory = directory
+        return graph
+
+    # Returns the dense ID of a node, or -1 if it is not in the graph
+    def denseId(self, node):
+        i = np.searchsorted(self.nodeIds, node)
+        if (i < self.numNodes and self.nodeIds[i] == node):
+            return int(i)
+        return -1
+
+    # Returns the dense IDs of an array of nodes (-1 where missing)
+    def denseIds(self, nodes):
+        nodes = np.asarray(nodes, dtype=np.int64)
+        ids = np.searchsorted(self.nodeIds, nodes)
+        ids[ids == self.numNodes] = 0
+        ids[self.nodeIds[ids] != nodes] = -1
+        return ids
+
+    # Returns the dense IDs that the given dense ID follows
+    def successors(self, i):
+        return self.outIndices[self.outIndptr[i]:self.outIndptr[i + 1]]
+
+    # Returns the dense IDs that follow the given dense ID
+    def predecessors(self, i):
+        return self.inIndices[self.inIndptr[i]:self.inIndptr[i + 1]]
+
+    # Returns every edge as a sorted key of source * numNodes + sink
+    def edgeKeys(self):
+        if (self._edgeKeys is None):
+            sources = np.repeat(np.arange(self.numNodes, dtype=np.int64),
+                                self.outDegree())
+            self._edgeKeys = np.sort(sources * self.numNodes + self.outIndices)
+        return self._edgeKeys
+
+    # Returns a SHA-1 of the node IDs and edges, identifying the graph's content
+    def fingerprint(self):
+        if (self._fingerprint is None):
+            sha1 = hashlib.sha1()
+            for array in [self.nodeIds, self.outIndptr, self.outIndices]:
+                sha1.update(np.ascontiguousarray(array, dtype=np.int64))
+            self._fingerprint = sha1.hexdigest()
+        return self._fingerprint
+
+    # Returns which of the given dense (source, sink) pairs are edges
+    def hasEdges(self, sources, sinks):
+        sources = np.asarray(sources, dtype=np.int64)
+        counts = self.outIndptr[sources + 1] - self.outIndptr[sources]
+        pairs = np.repeat(np.arange(len(sources)), counts)
+        offsets = np.cumsum(counts) - counts
+        positions = self.outIndptr[sources][pairs] \
+                    + np.arange(len(pairs)) - offsets[pairs]
+        matches = self.outIndices[positions] == np.asarray(sinks)[pairs]
+        return np.bincount(pairs[matches], minlength = len(sources)) > 0
+
+    # Returns a binary sparse matrix of the given dense IDs' rows (duplicates
+    # counted once), following sinks if outgoing, otherwise sources (SciPy is
+    # only imported here, so loading a graph stays quick)
+    def subMatrix(self, nodes, outgoing = True):
+
+        from scipy import sparse
+
+        indptr = self.outIndptr if (outgoing) else self.inIndptr
+        indices = self.outIndices if (outgoing) else self.inIndices
+        nodes = np.asarray(nodes, dtype=np.int64)
+
+        counts = indptr[nodes + 1] - indptr[nodes]
+        rows = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum(counts, out = rows[1:])
+        positions = np.repeat(indptr[nodes] - rows[:-1], counts) \
+                    + np.arange(rows[-1])
+
+        matrix = sparse.csr_matrix(
+            (np.ones(rows[-1], dtype=np.int32), indices[positions], rows),
+            shape = (len(nodes), self.numNodes))
+        matrix.sum_duplicates()
+        matrix.data[:] = 1
+        return matrix
+
+    # Returns the number of sinks per dense ID
+    def outDegree(self):
+        return np.diff(self.outIndptr)
+
+    # Returns the number of distinct sinks per dense ID
+    def distinctOutDegree(self):
+        if (self._distinctOutDegree is None):
+            sources = np.unique(self.edgeKeys()) // self.numNodes
+            self._distinctOutDegree = np.bincount(sources,
+                                                  minlength = self.numNodes)
+        return self._distinctOutDegree
+
+    # Returns the number of sources per dense ID
+    def inDegree(self):
+        return np.diff(self.inIndptr)
+
+################################################################################
+
+class AdjacencyView:
+    """
+    A read-only view of one direction of a Graph that behaves like the
+    original dict of lists, keyed and valued by original node IDs
+    """
+    def __init__(self, graph, indptr, indices):
+        self.graph = graph
+        self.indptr = indptr
+        self.indices = indices
+        self._keys = None
+
+    # Returns the neighbours of a node as original node IDs (array-native)
+    def array(self, node, default = None):
+        i = self.graph.denseId(node)
+        if (i < 0 or self.indptr[i] == self.indptr[i + 1]):
+            return default
+        return self.graph.nodeIds[self.indices[self.indptr[i]:
+                                               self.indptr[i + 1]]]
+
+    # Returns the neighbours of a node as dense IDs (array-native)
+    def dense(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    # Returns the dense IDs of every node with at least one neighbour
+    def denseKeys(self):
+        if (self._keys is None):
+            self._keys = np.flatnonzero(np.diff(self.indptr))
+        return self._keys
+
+    def get(self, node, default = None):
+        neighbours = self.array(node)
+        if (neighbours is None):
+            return default
+        return neighbours.tolist()
+
+    def __getitem__(self, node):
+        neighbours = self.get(node)
+        if (neighbours is None):
+            raise KeyError(node)
+        return neighbours
+
+    def __contains__(self, node):
+        i = self.graph.denseId(node)
+        return i >= 0 and self.indptr[i] != self.indptr[i + 1]
+
+    def __len__(self):
+        return len(self.denseKeys())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return self.graph.nodeIds[self.denseKeys()].tolist()
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+################################################################################
+
+# Returns which of the given keys appear in a sorted array
+def sortedContains(sortedKeys, keys):
+
+    if (len(sortedKeys) == 0):
+        return np.zeros(len(keys), dtype=bool)
+
+    positions = np.searchsorted(sortedKeys, keys)
+    positions[positions == len(sortedKeys)] = 0
+
+    return sortedKeys[positions] == keys
+
+################################################################################
+
+# Sorts (row, col) pairs into CSR arrays, keeping the given order within rows
+def compress(rows, cols, n):
+
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+
+    return indptr, cols[order]
+
+################################################################################
@@ -0,0 +1,127 @@
+import os
+import shutil
+import hashlib
+import tempfile
+
+import numpy as np
+
+from Constants import *
+from Graph import Graph
+
+# Bump this when the cached layout changes so old caches are ignored
+CACHE_VERSION = 1
+
+# The sampled edge splits stored alongside the graph
+SPLITS = ["trainReal", "devReal", "trainFake", "devFake"]
+
+################################################################################
+
+# Returns the cached graph and edge splits for a file, or None if not cached
+def loadTrainingCache(file, seed = None, verbose = False):
+
+    directory = cacheDirectory(file, seed)
+    if (not os.path.isdir(directory)):
+        return None
+
+    # A cache that cannot be read is parsed again like a missing one
+    try:
+        graph = Graph.load(directory)
+        splits = [np.load(os.path.join(directory, name + ".npy"),
+                          mmap_mode = 'r')
+                  for name in SPLITS]
+    except (OSError, ValueError) as error:
+        print("Could not load the graph cache from {}: {}"
+              .format(directory, error))
+        return None
+
+    if (verbose):
+        print("Loaded cached graph from {}".format(directory))
+
+    return (graph,) + tuple(splits)
+
+################################################################################
+
+# Saves the graph and edge splits so later runs can memory-map them. The
+# cache is only an optimisation, so failing to write it (a full disk, an
+# unwritable directory) is reported and the run carries on
+def saveTrainingCache(file, seed, graph,
+                      trainReal, devReal, trainFake, devFake, verbose = False):
+
+    directory = cacheDirectory(file, seed)
+    parent = os.path.dirname(directory)
+    tmp = None
+
+    try:
+        os.makedirs(parent, exist_ok = True)
+
+        # Write into a temporary directory first so readers never see half a
+        # cache
+        tmp = tempfile.mkdtemp(dir = parent)
+        graph.save(tmp)
+        splits = [trainReal, devReal, trainFake, devFake]
+        for name, edges in zip(SPLITS, splits):
+            edges = np.array(edges, dtype=np.int64).reshape(-1, 2)
+            np.save(os.path.join(tmp, name + ".npy"), edges)
+        os.rename(tmp, directory)
+        tmp = None
+        if (verbose):
+            print("Saved graph cache to {}".format(directory))
+    except OSError as error:
+        # Renaming fails when another process saved the same cache first,
+        # which is expected; anything else is worth knowing about
+        if (not os.path.isdir(directory)):
+            print("Could not save the graph cache to {}: {}"
+                  .format(directory, error))
+    finally:
+        if (tmp is not None):
+            shutil.rmtree(tmp, ignore_errors = True)
+
+################################################################################
+
+# Returns the cache directory for a file, keyed by its hash, split sizes and
+# sampling seed
+def cacheDirectory(file, seed = None):
+
+    key = "{}-v{}-t{}-d{}".format(fileHash(file), CACHE_VERSION,
+                                  TRAINING_LIMIT, DEV_LIMIT)
+    if (seed is not None):
+        key += "-s{}".format(seed)
+
+    return os.path.join(file + CACHE_SUFFIX, key)
+
+################################################################################
+
+# Returns the SHA-1 of a file, remembered per (size, mtime) to avoid rehashing.
+# Remembering it is best-effort, so a cache directory that cannot be written
+# (read-only data, or a file in its place) only means hashing again next time
+def fileHash(file):
+
+    stat = os.stat(file)
+    stamp = os.path.join(file + CACHE_SUFFIX, "sha1-{}-{}"
+                         .format(stat.st_size, stat.st_mtime_ns))
+
+    try:
+        with open(stamp, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        pass
+
+    sha1 = hashlib.sha1()
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(chunk)
+    digest = sha1.hexdigest()
+
+    tmp = stamp + ".tmp{}".format(os.getpid())
+    try:
+        os.makedirs(file + CACHE_SUFFIX, exist_ok = True)
+        with open(tmp, 'w') as f:
+            f.write(digest)
+        os.replace(tmp, stamp)
+    except OSError:
+        if (os.path.isfile(tmp)):
+            os.remove(tmp)
+
+    return digest
+
+################################################################################
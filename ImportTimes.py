@@ -0,0 +1,105 @@
+import os
+import re
+import sys
+import subprocess
+
+from Constants import *
+
+'''
+Reports how long the entry points take to import, from the output of
+"python -X importtime", and checks that none of them loads a library in
+HEAVY_MODULES at start-up or takes longer than IMPORT_TIME_BUDGET. Every
+entry point keeps its work behind a __main__ guard, so importing it only
+runs its top-level imports (imports inside functions are left out, as they
+should be).
+
+    python ImportTimes.py                 - every entry point in ENTRY_POINTS
+    python ImportTimes.py proj1 Sweep     - the named entry points
+
+The exit status is 1 if any entry point breaks the checks.
+'''
+
+# The scripts that are run directly
+ENTRY_POINTS = ["proj1", "Predictor", "Sweep"]
+
+# The number of slowest imports listed per entry point
+SLOWEST = 10
+
+# A line of -X importtime output: self and cumulative microseconds, then the
+# module name indented by two spaces per level of nesting
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+# The repository's directory, which the imports are run from
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+################################################################################
+
+# Imports the modules in a fresh interpreter and returns its -X importtime
+# records as (self, cumulative, depth, name) tuples, times in seconds
+def importRecords(modules):
+
+    statement = "import " + ", ".join(modules) if (modules) else "pass"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                             statement], cwd = DIRECTORY,
+                            stderr = subprocess.PIPE,
+                            universal_newlines = True)
+    if (result.returncode != 0):
+        raise RuntimeError("Importing {} failed:\n{}"
+                           .format(", ".join(modules), result.stderr))
+
+    records = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if (match is not None):
+            records.append((int(match.group(1)) / 1e6,
+                            int(match.group(2)) / 1e6,
+                            len(match.group(3)) // 2, match.group(4)))
+
+    return records
+
+################################################################################
+
+# Returns the import records of an entry point, leaving out the modules the
+# interpreter imports on its own at start-up
+def entryRecords(name, startup):
+    return [record for record in importRecords([name])
+            if (record[3] not in startup)]
+
+################################################################################
+
+# Prints the import time of an entry point and its slowest imports, and
+# returns whether it passes the checks
+def reportEntry(name, startup):
+
+    records = entryRecords(name, startup)
+    total = sum(record[1] for record in records if (record[2] == 0))
+    loaded = set(record[3].split(".")[0] for record in records)
+    heavy = [module for module in HEAVY_MODULES if (module in loaded)]
+
+    print("{}: {:.3f} secs, {} modules".format(name, total, len(records)))
+    for own, cumulative, depth, module in \
+            sorted(records, key = lambda record: -record[1])[:SLOWEST]:
+        print("    {:<40} {:.3f} secs ({:.3f} secs itself)"
+              .format(module, cumulative, own))
+
+    passed = True
+    if (heavy):
+        print("    Heavy libraries imported at start-up: {}"
+              .format(", ".join(heavy)))
+        passed = False
+    if (total > IMPORT_TIME_BUDGET):
+        print("    Over the import time budget of {:.3f} secs"
+              .format(IMPORT_TIME_BUDGET))
+        passed = False
+
+    return passed
+
+################################################################################
+
+if (__name__ == "__main__"):
+
+    names = sys.argv[1:] if (len(sys.argv) > 1) else ENTRY_POINTS
+    startup = set(record[3] for record in importRecords([]))
+
+    results = [reportEntry(name, startup) for name in names]
+    sys.exit(0 if (all(results)) else 1)
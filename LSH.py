@@ -0,0 +1,78 @@
+import numpy as np
+
+from Constants import *
+
+################################################################################
+
+class LSHIndex:
+    """
+    A locality-sensitive hashing index over the MinHash signatures of each
+    node's out-neighbours (who it follows). Signatures are split into `bands`
+    bands of `rows` slots, and nodes sharing any whole band become candidate
+    neighbours. Two nodes with Jaccard similarity J are candidates with
+    probability 1 - (1 - J^rows)^bands, so more bands raise recall and more
+    rows raise precision.
+    """
+    def __init__(self, graph, sketch, bands = LSH_BANDS, rows = LSH_ROWS,
+                 seed = 0):
+        assert(bands * rows <= sketch.length)
+        self.sketch = sketch
+        self.graph = graph
+        self.bands = bands
+        self.rows = rows
+
+        rng = np.random.default_rng(seed)
+        self.multipliers = rng.integers(1, 1 << 63, size = rows,
+                                        dtype=np.uint64) | np.uint64(1)
+
+        # Only nodes that follow someone can be neighbours
+        nodes = np.flatnonzero(self.graph.outDegree())
+        signatures = sketch.outSignatures[nodes]
+
+        # One sorted table of (band key, node) per band
+        self.keys = []
+        self.nodes = []
+        for band in range(bands):
+            keys = self.bandKeys(signatures, band)
+            order = np.argsort(keys, kind='stable')
+            self.keys.append(keys[order])
+            self.nodes.append(nodes[order])
+
+    # Hashes one band of each signature to a single 64-bit key
+    def bandKeys(self, signatures, band):
+        block = signatures[..., band * self.rows:(band + 1) * self.rows]
+        return (block.astype(np.uint64) * self.multipliers).sum(axis = -1)
+
+    # Returns the dense IDs sharing at least one band with the given dense ID
+    def candidates(self, i):
+
+        signature = self.sketch.outSignatures[i]
+        found = []
+        for band in range(self.bands):
+            key = self.bandKeys(signature, band)
+            low = np.searchsorted(self.keys[band], key, side = 'left')
+            high = np.searchsorted(self.keys[band], key, side = 'right')
+            found.append(self.nodes[band][low:high])
+
+        candidates = np.unique(np.concatenate(found))
+        return candidates[candidates != i]
+
+    # Returns the approximate k nearest neighbours of a node as (node, Jaccard)
+    # tuples, padded with (0, 0) like getNeighbours
+    def neighbours(self, source, k = 10):
+
+        neighbours = []
+        i = self.graph.denseId(source)
+
+        if (i >= 0 and self.graph.outIndptr[i] != self.graph.outIndptr[i + 1]):
+            candidates = self.candidates(i)
+            scores = self.sketch.jaccard(np.full(len(candidates), i),
+                                         candidates)
+            order = np.argsort(-scores, kind='stable')[:k]
+            order = order[scores[order] > 0]
+            nodes = self.graph.nodeIds[candidates[order]]
+            neighbours = list(zip(nodes.tolist(), scores[order].tolist()))
+
+        return neighbours + [(0, 0) for j in range(k - len(neighbours))]
+
+################################################################################
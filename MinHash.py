@@ -0,0 +1,109 @@
+import os
+from math import log, sqrt
+
+import numpy as np
+
+from Constants import *
+
+# A Mersenne prime larger than any dense ID, used by the hash functions
+PRIME = (1 << 31) - 1
+
+# The arrays that make up a sketch, and the prefix of their saved files (so
+# they can sit next to a saved graph's)
+SKETCH_ARRAYS = ["a", "b", "outSignatures", "inSignatures"]
+SKETCH_PREFIX = "minhash-"
+
+################################################################################
+
+class MinHashSketch:
+    """
+    Fixed-size MinHash signatures of every node's out-neighbours (who it
+    follows) and in-neighbours (who follows it), for estimating Jaccard
+    similarity in O(length) per comparison.
+
+    Each signature slot agrees with probability J, so the estimate is the
+    mean of `length` Bernoulli(J) trials: its standard error is
+    sqrt(J(1 - J) / length) <= 1 / (2 sqrt(length)), and by Hoeffding
+    P(|estimate - J| > errorBound(delta)) <= delta.
+    """
+    def __init__(self, graph, length = MINHASH_LENGTH, seed = 0):
+        self.length = length
+
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, PRIME, size = length, dtype=np.uint64)
+        self.b = rng.integers(0, PRIME, size = length, dtype=np.uint64)
+
+        self.outSignatures = self.signatures(graph.outIndptr, graph.outIndices)
+        self.inSignatures = self.signatures(graph.inIndptr, graph.inIndices)
+
+        # The directory the arrays are memory-mapped from, if any
+        self.directory = None
+
+    # Saves the sketch arrays as .npy files in the given directory
+    def save(self, directory):
+        for name in SKETCH_ARRAYS:
+            np.save(os.path.join(directory, SKETCH_PREFIX + name + ".npy"),
+                    getattr(self, name))
+
+    # Loads a saved sketch, memory-mapping the arrays unless mmapMode is None
+    @classmethod
+    def load(cls, directory, mmapMode = 'r'):
+        sketch = cls.__new__(cls)
+        for name in SKETCH_ARRAYS:
+            setattr(sketch, name,
+                    np.load(os.path.join(directory,
+                                         SKETCH_PREFIX + name + ".npy"),
+                            mmap_mode = mmapMode))
+        sketch.length = len(sketch.a)
+        sketch.directory = directory if (mmapMode is not None) else None
+        return sketch
+
+    # Returns a (numNodes, length) matrix of the minimum hash of each row
+    def signatures(self, indptr, indices):
+
+        signatures = np.full((len(indptr) - 1, self.length), PRIME,
+                             dtype=np.uint32)
+        rows = np.flatnonzero(np.diff(indptr))
+        if (len(rows) == 0):
+            return signatures
+
+        indices = np.asarray(indices, dtype=np.uint64)
+        for i in range(self.length):
+            hashes = (self.a[i] * indices + self.b[i]) % np.uint64(PRIME)
+            signatures[rows, i] = np.minimum.reduceat(hashes, indptr[rows])
+
+        return signatures
+
+    # Returns the estimated Jaccard similarity of each pair of dense IDs'
+    # neighbour sets (0 where either set is empty or the ID is missing)
+    def jaccard(self, first, second, outgoing = True):
+
+        signatures = self.outSignatures if (outgoing) else self.inSignatures
+        first = np.asarray(first, dtype=np.int64)
+        second = np.asarray(second, dtype=np.int64)
+        estimates = np.zeros(len(first))
+
+        ok = (first >= 0) & (second >= 0)
+        a = signatures[first[ok]]
+        b = signatures[second[ok]]
+        agree = ((a == b) & (a != PRIME)).mean(axis = 1)
+        estimates[ok] = agree
+
+        return estimates
+
+    # Returns the estimated intersection sizes given both sets' sizes, using
+    # |A ^ B| = J (|A| + |B|) / (1 + J)
+    def intersection(self, first, second, firstSize, secondSize,
+                     outgoing = True):
+
+        j = self.jaccard(first, second, outgoing)
+        intersect = j * (firstSize + secondSize) / (1 + j)
+
+        return np.minimum(intersect, np.minimum(firstSize, secondSize))
+
+    # Returns the error that the Jaccard estimate exceeds with probability
+    # at most delta
+    def errorBound(self, delta = 0.05):
+        return sqrt(log(2 / delta) / (2 * self.length))
+
+################################################################################
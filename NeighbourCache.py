@@ -0,0 +1,67 @@
+from collections import OrderedDict
+
+from Constants import *
+
+################################################################################
+
+class NeighbourCache:
+    """
+    Caches each node's neighbours as a frozenset in front of an adjacency
+    (sourceDict or sinkDict). Sets are weighted by their size and the least
+    recently used ones are evicted once the total exceeds the budget.
+    """
+    def __init__(self, edgeDict, budget = NEIGHBOUR_CACHE_BUDGET):
+        self.edgeDict = edgeDict
+        self.budget = budget
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._sets = OrderedDict()
+
+    # Returns the neighbours of a node as a frozenset
+    def get(self, node):
+
+        neighbours = self._sets.get(node)
+        if (neighbours is not None):
+            self.hits += 1
+            self._sets.move_to_end(node)
+            return neighbours
+
+        self.misses += 1
+        neighbours = frozenset(self.edgeDict.get(node, []))
+        weight = weightOf(neighbours)
+
+        # Sets larger than the whole budget are never kept
+        if (weight <= self.budget):
+            self._sets[node] = neighbours
+            self.size += weight
+            while (self.size > self.budget):
+                _, evicted = self._sets.popitem(last = False)
+                self.size -= weightOf(evicted)
+                self.evictions += 1
+
+        return neighbours
+
+    # Returns the hit/miss statistics, for tuning the budget
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hitRate": self.hits / lookups if (lookups > 0) else 0.0,
+                "entries": len(self._sets),
+                "size": self.size}
+
+    def __str__(self):
+        return ("{hits} hits, {misses} misses ({hitRate:.1%}), {evictions} "
+                "evictions, {entries} sets holding {size} IDs"
+                .format(**self.stats()))
+
+################################################################################
+
+# The weight of a cached set (one per ID, plus one for the set itself)
+def weightOf(neighbours):
+    return len(neighbours) + 1
+
+################################################################################
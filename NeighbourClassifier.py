@@ -1,25 +1,38 @@
+from heapq import nlargest
+
+import numpy as np
+
 from Constants import *
+from NeighbourCache import NeighbourCache
+from QueryPlanner import QueryPlan
 
 ################################################################################
 
 # Classifies the data based on nearest neighbours
-def neighbourClassifier(x, edgeDict):
+def neighbourClassifier(x, edgeDict, index = None, sinkDict = None):
 
     predictions = []
 
+    # Every query compares against every key, so keep their sets around
+    cache = NeighbourCache(edgeDict)
+
+    # Find each distinct source's neighbours once, however many pairs it has
+    plan = QueryPlan(x)
+    allNeighbours = plan.mapSources(
+        lambda source: getNeighbours(source, edgeDict, k = 10, cache = cache,
+                                     index = index, sinkDict = sinkDict))
+
     for i in range(len(x)):
 
-        source = x[i][0]
         sink = x[i][1]
-            
-        neighbours = getNeighbours(source, edgeDict, k = 10)
+        neighbours = allNeighbours[i]
         
         if (len(neighbours) == 0):
             # Guess if there are no neighbours
             pred = 0.5
         else:
             # Get the percentage of neighbours that follow this sink
-            pred = sum([1 if sink in edgeDict.get(neighbours[j][0], []) else 0
+            pred = sum([1 if sink in cache.get(neighbours[j][0]) else 0
                          for j in range(len(neighbours))]) / len(neighbours)
 
         # Min-max values
@@ -34,10 +47,20 @@ def neighbourClassifier(x, edgeDict):
 
 ################################################################################
 
-# Returns the k nodes closest to the source node
-def getNeighbours(source, edgeDict, k = 10, verbose = False):
+# Returns the k nodes closest to the source node, approximately if given an
+# LSHIndex, or exactly through the inverted index if given sinkDict
+def getNeighbours(source, edgeDict, k = 10, verbose = False, cache = None,
+                  index = None, sinkDict = None):
 
-    sinks = list(set(edgeDict[source]))
+    if (index is not None):
+        return index.neighbours(source, k)
+    if (sinkDict is not None):
+        return getNeighboursExact(source, sinkDict, k)
+
+    if (cache is None):
+        cache = NeighbourCache(edgeDict)
+
+    sinks = cache.get(source)
     neighbours = [(0, 0) for i in range(k)]
 
     done = 1
@@ -50,11 +73,11 @@ def getNeighbours(source, edgeDict, k = 10, verbose = False):
         if (key == source):
             continue
         
-        neighbourSinks = list(set(edgeDict[key]))
+        neighbourSinks = cache.get(key)
         
-        # (A ^ B) = A + B - (A v B)
-        union = len(list(set(sinks + neighbourSinks)))
-        intersect = len(sinks) + len(neighbourSinks) - union
+        # (A v B) = A + B - (A ^ B)
+        intersect = len(sinks & neighbourSinks)
+        union = len(sinks) + len(neighbourSinks) - intersect
         match = intersect / union
 
         neighbours.append((key, match))
@@ -84,3 +107,38 @@ def getNeighbours(source, edgeDict, k = 10, verbose = False):
     return neighbours        
 
 ################################################################################
+
+# Returns the same k nodes as the scan in getNeighbours, but only scores the
+# nodes that share a sink with the source, found through sinkDict's postings
+def getNeighboursExact(source, sinkDict, k = 10):
+
+    graph = sinkDict.graph
+    neighbours = []
+    i = graph.denseId(source)
+
+    sinks = np.unique(graph.successors(i)) if (i >= 0) else []
+
+    if (len(sinks) > 0):
+        # Gather who else follows each sink, once per (follower, sink)
+        postings = [graph.predecessors(sink) for sink in sinks]
+        followers = np.concatenate(postings).astype(np.int64)
+        shared = np.repeat(np.arange(len(sinks)), [len(p) for p in postings])
+        followers = np.unique(followers * len(sinks) + shared) // len(sinks)
+
+        # Count the intersections in one pass over the postings
+        candidates, intersect = np.unique(followers, return_counts = True)
+        keep = candidates != i
+        candidates, intersect = candidates[keep], intersect[keep]
+
+        sizes = graph.distinctOutDegree()[candidates]
+        union = len(sinks) + sizes - intersect
+        matches = (intersect / union).tolist()
+
+        # Ties keep key order, as the scan does
+        best = nlargest(k, range(len(matches)), key = matches.__getitem__)
+        neighbours = [(int(graph.nodeIds[candidates[j]]), matches[j])
+                      for j in best]
+
+    return neighbours + [(0, 0) for j in range(k - len(neighbours))]
+
+################################################################################
@@ -0,0 +1,124 @@
+import numpy as np
+
+from Constants import *
+
+################################################################################
+
+class NumpyMLP:
+    """
+    The network runNN builds in TensorFlow, in plain NumPy: fully connected
+    sigmoid layers (including the single output neuron), Glorot-uniform
+    weights and biases, a mean squared error loss and plain gradient descent.
+    The forward and backward passes handle a whole batch with one matrix
+    product per layer.
+    """
+    def __init__(self, layers, seed = None):
+        rng = np.random.default_rng(seed)
+        self.layers = list(layers)
+        self.weights = [glorotUniform(rng, (layers[i], layers[i + 1]))
+                        for i in range(len(layers) - 1)]
+        self.biases = [glorotUniform(rng, (layers[i + 1],))
+                       for i in range(len(layers) - 1)]
+
+    # Returns the weights and biases, in that order
+    def parameters(self):
+        return self.weights + self.biases
+
+    # Replaces the weights and biases with copies of the given ones
+    def setParameters(self, parameters):
+        n = len(self.weights)
+        self.weights = [np.array(p, copy=True) for p in parameters[:n]]
+        self.biases = [np.array(p, copy=True) for p in parameters[n:]]
+
+    # Returns the activations of every layer, starting with the input
+    def forward(self, x):
+        activations = [x]
+        for W, b in zip(self.weights, self.biases):
+            activations.append(sigmoid(activations[-1] @ W + b))
+        return activations
+
+    # Returns the network's output for each row of x
+    def predict(self, x):
+        return self.forward(np.asarray(x, dtype=np.float64))[-1].reshape(-1)
+
+    # Takes one gradient descent step on a batch and returns its loss
+    def step(self, x, y, learningRate):
+
+        activations = self.forward(x)
+        output = activations[-1].reshape(-1)
+        error = output - y
+
+        # d(mean squared error) / d(weighted sum), back through each sigmoid
+        delta = ((2 / len(y)) * error * output * (1 - output)).reshape(-1, 1)
+        for i in range(len(self.weights) - 1, -1, -1):
+            a = activations[i]
+            gradient = a.T @ delta
+            if (i > 0):
+                back = (delta @ self.weights[i].T) * a * (1 - a)
+            self.weights[i] -= learningRate * gradient
+            self.biases[i] -= learningRate * delta.sum(axis = 0)
+            if (i > 0):
+                delta = back
+
+        return float(np.mean(error**2))
+
+################################################################################
+
+# Trains a NumpyMLP on the batches of the given iterator (a DatasetIterator,
+# or the whole training set as one batch if None) and returns it. Given an
+# EarlyStopping monitor, training stops once the validation AUC stops
+# improving and the best parameters are restored
+def trainNumpy(xTrain, yTrain, hidden_layers = [], iterator = None,
+               epochs = EPOCHS, learningRate = LEARNING_RATE, seed = None,
+               verbose = True, monitor = None):
+
+    xTrain = np.asarray(xTrain, dtype=np.float64)
+    yTrain = np.asarray(yTrain, dtype=np.float64)
+    if (iterator is None):
+        iterator = [(xTrain, yTrain)]
+
+    model = NumpyMLP([xTrain.shape[1]] + list(hidden_layers) + [1], seed)
+
+    start = timer()
+
+    # Run gradient descent for multiple epochs
+    for epoch in range(epochs):
+        total = 0.0
+        batches = 0
+        for X_batch, Y_batch in iterator:
+            total += model.step(X_batch, Y_batch, learningRate)
+            batches += 1
+        if (verbose):
+            current = timer()
+            print("Epoch {} / {}: loss = {:.4f} ({:.2f} secs)"
+                  .format(epoch + 1, epochs, total / batches, current - start))
+        if (monitor is not None and monitor.due(epoch)):
+            if (monitor.update(epoch, model.predict(monitor.xDev),
+                               model.parameters())):
+                break
+
+    if (monitor is not None and monitor.bestParameters is not None):
+        monitor.report()
+        model.setParameters(monitor.bestParameters)
+
+    if (verbose):
+        print("Optimization complete.")
+
+    return model
+
+################################################################################
+
+# Returns the logistic function of every element
+def sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+################################################################################
+
+# Returns an array drawn like tf.glorot_uniform_initializer (a 1D shape has
+# fan in and fan out both equal to its length)
+def glorotUniform(rng, shape):
+    fanIn, fanOut = (shape[0], shape[0]) if (len(shape) == 1) else shape
+    limit = np.sqrt(6.0 / (fanIn + fanOut))
+    return rng.uniform(-limit, limit, size = shape)
+
+################################################################################
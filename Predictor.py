@@ -0,0 +1,127 @@
+import sys
+from itertools import islice
+
+import numpy as np
+
+from Constants import *
+from CSVWriter import writeNumberedCSV
+from FeatureFile import loadFeatureBinary, currentBinary
+
+################################################################################
+
+# Saves a trained network: its weights and biases, the layer sizes, which
+# feature file columns it reads and the offset added to them (see addE)
+def saveModel(filename, weights, biases, features, offset = ADD_E):
+
+    layers = [len(weights[0])] + [len(b) for b in biases]
+    arrays = {"layers": np.array(layers), "features": np.array(features),
+              "offset": np.array(offset)}
+    for i, (W, b) in enumerate(zip(weights, biases)):
+        arrays["weights-{}".format(i)] = np.asarray(W, dtype=np.float64)
+        arrays["bias-{}".format(i)] = np.asarray(b, dtype=np.float64)
+
+    np.savez_compressed(filename, **arrays)
+
+################################################################################
+
+class Predictor:
+    """
+    Scores feature matrices with a network saved by saveModel, using plain
+    NumPy matrix products (TensorFlow is never imported). Rows are scored
+    PREDICT_CHUNK_ROWS at a time, so memory stays bounded for any input.
+    """
+    def __init__(self, filename):
+        with np.load(filename) as model:
+            self.layers = model["layers"].tolist()
+            self.features = model["features"].tolist()
+            self.offset = float(model["offset"])
+            self.weights = [model["weights-{}".format(i)]
+                            for i in range(len(self.layers) - 1)]
+            self.biases = [model["bias-{}".format(i)]
+                           for i in range(len(self.layers) - 1)]
+
+    # Returns the predictions for rows of already selected features
+    def score(self, x):
+        a = np.asarray(x, dtype=np.float64) + self.offset
+        for W, b in zip(self.weights, self.biases):
+            a = 1.0 / (1.0 + np.exp(-(a @ W + b)))
+        return a.reshape(-1)
+
+    # Returns the predictions for a feature matrix with one column per
+    # feature file column (f1, f2, ...)
+    def predict(self, x, chunkRows = PREDICT_CHUNK_ROWS):
+        return np.concatenate([self.score(chunk) for chunk
+                               in self.chunks(x, chunkRows)] + [np.zeros(0)])
+
+    # Yields the model's feature columns of a matrix, chunkRows rows at a time
+    def chunks(self, x, chunkRows):
+        for start in range(0, len(x), chunkRows):
+            yield np.asarray(x[start:start + chunkRows])[:, self.features]
+
+    # Yields the predictions for a feature file, chunk by chunk, memory-mapping
+    # its binary copy if there is an up-to-date one
+    def predictFile(self, filename, chunkRows = PREDICT_CHUNK_ROWS):
+
+        binary = currentBinary(filename)
+        if (binary is not None):
+            for chunk in self.chunks(featureMatrixOf(binary), chunkRows):
+                yield self.score(chunk)
+            return
+
+        # Skip the Id column of the CSV
+        columns = [i + 1 for i in self.features]
+        with open(filename, 'r') as file:
+            file.readline()
+            while True:
+                lines = list(islice(file, chunkRows))
+                if (not lines):
+                    return
+                yield self.score(np.loadtxt(lines, delimiter = ",", ndmin = 2,
+                                            usecols = columns))
+
+################################################################################
+
+# Scores a feature file with a saved model and writes the predictions to the
+# next free predictions-N.csv file
+def predictToFile(modelFile, featureFile):
+
+    predictor = Predictor(modelFile)
+    predictions = (p for chunk in predictor.predictFile(featureFile)
+                   for p in chunk.tolist())
+    ids = range(1, countRows(featureFile) + 1)
+
+    filename = writeNumberedCSV(SAVE_FILE, ".csv", "Id,Prediction",
+                                [ids, predictions])
+
+    if (filename is not None):
+        print("File saved as: {}".format(filename))
+    else:
+        print("File could not be saved.")
+
+    return filename
+
+################################################################################
+
+# Returns the number of instances in a feature file
+def countRows(filename):
+
+    binary = currentBinary(filename)
+    if (binary is not None):
+        return len(featureMatrixOf(binary))
+
+    with open(filename, 'rb') as file:
+        return sum(chunk.count(b"\n")
+                   for chunk in iter(lambda: file.read(CHUNK_SIZE), b"")) - 1
+
+################################################################################
+
+# Returns the memory-mapped feature matrix of a binary feature file
+def featureMatrixOf(filename):
+    loaded = loadFeatureBinary(filename)
+    return loaded[0] if (isinstance(loaded, tuple)) else loaded
+
+################################################################################
+
+if (__name__ == "__main__"):
+    predictToFile(sys.argv[1] if (len(sys.argv) > 1) else MODEL_FILE,
+                  sys.argv[2] if (len(sys.argv) > 2) else TEST_FEATURES_FILE)
@@ -0,0 +1,50 @@
+import numpy as np
+
+from Constants import *
+
+################################################################################
+
+class QueryPlan:
+    """
+    Groups a list of (source, sink) pairs by source and by sink, so that
+    anything computed per node is computed once per distinct node and then
+    fanned back out to the pairs in their original order
+    """
+    def __init__(self, x):
+        x = np.asarray(x, dtype=np.int64).reshape(-1, 2)
+        self.size = len(x)
+        self.sources, self.sourceIndex = \
+                      np.unique(x[:, 0], return_inverse = True)
+        self.sinks, self.sinkIndex = \
+                    np.unique(x[:, 1], return_inverse = True)
+
+    # Returns function(source) for each distinct source, in sorted order
+    def perSource(self, function):
+        return [function(source) for source in self.sources.tolist()]
+
+    # Returns function(sink) for each distinct sink, in sorted order
+    def perSink(self, function):
+        return [function(sink) for sink in self.sinks.tolist()]
+
+    # Returns function(source) for every pair, calling it once per source
+    def mapSources(self, function):
+        return fanOut(self.perSource(function), self.sourceIndex)
+
+    # Returns function(sink) for every pair, calling it once per sink
+    def mapSinks(self, function):
+        return fanOut(self.perSink(function), self.sinkIndex)
+
+    # Yields (source, indices of its pairs) for each distinct source
+    def sourceGroups(self):
+        order = np.argsort(self.sourceIndex, kind='stable')
+        counts = np.bincount(self.sourceIndex, minlength = len(self.sources))
+        groups = np.split(order, np.cumsum(counts)[:-1])
+        return zip(self.sources.tolist(), groups)
+
+################################################################################
+
+# Returns the per-node values in pair order, given each pair's node index
+def fanOut(values, index):
+    return [values[i] for i in index.tolist()]
+
+################################################################################
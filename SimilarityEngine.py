@@ -0,0 +1,355 @@
+import shutil
+import tempfile
+from multiprocessing import Pool
+
+import numpy as np
+
+from Constants import *
+from Graph import Graph
+from MinHash import MinHashSketch
+
+'''
+Computes the neighbourhood similarity features for a whole list of
+(source, sink) pairs at once. Every intersection count comes from a sparse
+matrix product over the adjacency, so no per-pair sets are built.
+
+Each side of a pair compares one "query" node's neighbours against the
+neighbours of every "member" linked to an "anchor" node:
+    source side - query = source, members = those who follow sink,
+                  compared by who they follow
+    sink side   - query = sink, members = those source follows,
+                  compared by who follows them
+With duplicate-free adjacency lists the results match the per-pair code in
+FeatureProcessor and CreateFeatureFile.
+
+Given a MinHashSketch, the intersections are instead estimated from the
+nodes' signatures in O(signature length) per term (see MinHash.py for the
+error bound), which avoids the sparse products around very popular nodes.
+'''
+
+################################################################################
+
+# Returns the 8 Dice features of FeatureProcessor.processFeatures per pair
+def diceFeatures(x, graph, sketch = None):
+
+    sources, sinks = densePairs(x, graph)
+    features = np.zeros((len(sources), 8))
+
+    for side, (start, queries, anchors) in \
+        enumerate([(0, sources, sinks), (4, sinks, sources)]):
+
+        # Pairs sharing an anchor are batched together so they share work
+        order = np.argsort(anchors, kind='stable')
+
+        for batch in pairBatches(graph, anchors[order], side == 0):
+            rows = order[batch]
+            terms = sideTerms(graph, queries[rows], anchors[rows],
+                              side == 0, False, sketch)
+            pairs, intersect, nx, ny = terms
+            dice = (2 * intersect) / (nx + ny)
+            features[rows, start:start + 4] = \
+                            diceStatistics(dice, pairs, len(rows))
+
+    return features
+
+################################################################################
+
+# Returns the 28 features of CreateFeatureFile.processFeatures per pair
+def similarityFeatures(x, graph, sketch = None):
+
+    sources, sinks = densePairs(x, graph)
+    features = np.zeros((len(sources), 28))
+
+    for side, (start, queries, anchors) in \
+        enumerate([(0, sources, sinks), (14, sinks, sources)]):
+
+        # Pairs sharing an anchor are batched together so they share work
+        order = np.argsort(anchors, kind='stable')
+
+        for batch in pairBatches(graph, anchors[order], side == 0):
+            rows = order[batch]
+            terms = sideTerms(graph, queries[rows], anchors[rows],
+                              side == 0, True, sketch)
+            pairs, intersect, nx, ny = terms
+            similarities = similarityMetrics(intersect, nx, ny)
+            features[rows, start:start + 14] = \
+                            meanAndMax(similarities, pairs, len(rows))
+
+    return features
+
+################################################################################
+
+# Computes features (diceFeatures or similarityFeatures) with a pool of
+# processes that all memory-map the same copy of the graph
+def parallelFeatures(x, graph, features, workers = WORKERS, sketch = None):
+
+    x = np.asarray(x, dtype=np.int64).reshape(-1, 2)
+    if (workers <= 1 or len(x) == 0):
+        return features(x, graph, sketch)
+
+    # Workers attach to the graph's (and sketch's) files rather than receiving
+    # pickled copies
+    directory = graph.directory
+    tmp = None
+    if (directory is None):
+        tmp = directory = tempfile.mkdtemp()
+        graph.save(directory)
+
+    # The sketch goes next to the graph, unless the graph's directory is a
+    # cache that should not be written to
+    sketchDirectory = None if (sketch is None) else sketch.directory
+    if (sketch is not None and sketchDirectory is None):
+        if (tmp is None):
+            tmp = tempfile.mkdtemp()
+        sketchDirectory = tmp
+        sketch.save(sketchDirectory)
+
+    # Small chunks keep the workers busy when some pairs touch hubs
+    chunks = np.array_split(x, min(len(x), workers * WORKER_CHUNKS))
+
+    try:
+        with Pool(workers, initializer = attachGraph,
+                  initargs = (directory, sketchDirectory)) as pool:
+            results = pool.map(featureChunk,
+                               [(features, chunk) for chunk in chunks],
+                               chunksize = 1)
+    finally:
+        if (tmp is not None):
+            shutil.rmtree(tmp, ignore_errors = True)
+
+    return np.concatenate(results)
+
+################################################################################
+
+# The graph (and optional MinHash sketch) a worker process has attached to
+workerGraph = None
+workerSketch = None
+
+# Memory-maps the shared graph (and sketch) once per worker process
+def attachGraph(directory, sketchDirectory = None):
+    global workerGraph, workerSketch
+    workerGraph = Graph.load(directory)
+    if (sketchDirectory is not None):
+        workerSketch = MinHashSketch.load(sketchDirectory)
+
+# Computes one chunk of features in a worker process
+def featureChunk(task):
+    features, x = task
+    return features(x, workerGraph, workerSketch)
+
+################################################################################
+
+# Converts a list of (source, sink) pairs to arrays of dense IDs (-1 if absent)
+def densePairs(x, graph):
+
+    x = np.asarray(x, dtype=np.int64).reshape(-1, 2)
+
+    return graph.denseIds(x[:, 0]), graph.denseIds(x[:, 1])
+
+################################################################################
+
+# Yields index arrays of consecutive pairs whose members fit in one batch
+def pairBatches(graph, anchors, sourceSide):
+
+    indptr = graph.inIndptr if (sourceSide) else graph.outIndptr
+    valid = anchors >= 0
+    counts = np.zeros(len(anchors), dtype=np.int64)
+    counts[valid] = indptr[anchors[valid] + 1] - indptr[anchors[valid]]
+
+    start = 0
+    total = np.cumsum(counts)
+    while (start < len(anchors)):
+        done = total[start - 1] if (start > 0) else 0
+        end = np.searchsorted(total, done + ENGINE_TERMS, side = 'right')
+        end = min(max(end, start + 1), start + ENGINE_PAIRS, len(anchors))
+        yield np.arange(start, end)
+        start = end
+
+################################################################################
+
+# Returns, for every (pair, member) term on one side, the pair it belongs to,
+# the intersection size and the sizes of the two compared sets
+def sideTerms(graph, queries, anchors, sourceSide, removeEdge, sketch = None):
+
+    # Members come from the anchor's list, in the same order as sinkDict or
+    # sourceDict would give them
+    if (sourceSide):
+        indptr, indices = graph.inIndptr, graph.inIndices
+    else:
+        indptr, indices = graph.outIndptr, graph.outIndices
+
+    valid = anchors >= 0
+    counts = np.zeros(len(anchors), dtype=np.int64)
+    counts[valid] = indptr[anchors[valid] + 1] - indptr[anchors[valid]]
+    starts = np.zeros(len(anchors), dtype=np.int64)
+    starts[valid] = indptr[anchors[valid]]
+
+    pairs = np.repeat(np.arange(len(anchors)), counts)
+    offsets = np.cumsum(counts) - counts
+    members = indices[starts[pairs] + np.arange(len(pairs)) - offsets[pairs]]
+    members = members.astype(np.int64)
+    termQueries = queries[pairs]
+
+    if (sketch is None):
+        intersect, nx, ny = \
+                   lookupIntersections(graph, sourceSide, termQueries, members)
+    else:
+        intersect, nx, ny = \
+                   estimateIntersections(graph, sketch, sourceSide,
+                                         termQueries, members)
+
+    if (removeEdge):
+        # Forget the (source -> sink) edge itself, if it exists
+        both = (queries >= 0) & (anchors >= 0)
+        exists = np.zeros(len(queries), dtype=bool)
+        if (sourceSide):
+            exists[both] = graph.hasEdges(queries[both], anchors[both])
+        else:
+            exists[both] = graph.hasEdges(anchors[both], queries[both])
+        keep = ~(exists[pairs] & (members == termQueries))
+        removed = exists[pairs].astype(np.float64)
+        pairs, members = pairs[keep], members[keep]
+        intersect = np.maximum(intersect[keep] - removed[keep], 0)
+        nx, ny = nx[keep], ny[keep] - removed[keep]
+
+    return pairs, intersect, nx, ny
+
+################################################################################
+
+# Returns |query & member| and the sizes of both sets for each term, taking
+# the intersections from one sparse product of the rows involved
+def lookupIntersections(graph, outgoing, queries, members):
+
+    intersect = np.zeros(len(queries))
+    ny = np.zeros(len(queries))
+
+    uniqueMembers, memberIndex = np.unique(members, return_inverse = True)
+    memberRows = graph.subMatrix(uniqueMembers, outgoing)
+    nx = np.diff(memberRows.indptr)[memberIndex].astype(np.float64)
+
+    valid = queries >= 0
+    if (not valid.any()):
+        return intersect, nx, ny
+
+    uniqueQueries, queryIndex = np.unique(queries[valid], return_inverse = True)
+    queryRows = graph.subMatrix(uniqueQueries, outgoing)
+    ny[valid] = np.diff(queryRows.indptr)[queryIndex]
+
+    product = (queryRows @ memberRows.T).tocsr()
+    product.sum_duplicates()
+    product.sort_indices()
+    if (product.nnz == 0):
+        return intersect, nx, ny
+
+    # Look the needed entries up by their row-major key
+    width = len(uniqueMembers)
+    rows = np.repeat(np.arange(product.shape[0], dtype=np.int64),
+                     np.diff(product.indptr))
+    keys = rows * width + product.indices
+    wanted = queryIndex.astype(np.int64) * width + memberIndex[valid]
+    positions = np.searchsorted(keys, wanted)
+    positions[positions == len(keys)] = 0
+    found = keys[positions] == wanted
+
+    intersect[valid] = np.where(found, product.data[positions], 0)
+
+    return intersect, nx, ny
+
+################################################################################
+
+# Returns the same as lookupIntersections, with the intersections estimated
+# from MinHash signatures
+def estimateIntersections(graph, sketch, outgoing, queries, members):
+
+    indptr = graph.outIndptr if (outgoing) else graph.inIndptr
+    nx = (indptr[members + 1] - indptr[members]).astype(np.float64)
+    ny = np.zeros(len(queries))
+    valid = queries >= 0
+    ny[valid] = indptr[queries[valid] + 1] - indptr[queries[valid]]
+
+    intersect = sketch.intersection(queries, members, ny, nx, outgoing)
+
+    return intersect, nx, ny
+
+################################################################################
+
+# The similarity metrics of calcualteSimilarity in CreateFeatureFile, as
+# functions of the intersection and the two set sizes
+METRICS = [
+    lambda i, x, y: i,
+    lambda i, x, y: i / np.sqrt(x * y),
+    lambda i, x, y: i / (x + y - i),
+    lambda i, x, y: 2 * i / (x + y),
+    lambda i, x, y: i / np.minimum(x, y),
+    lambda i, x, y: i / np.maximum(x, y),
+    lambda i, x, y: i / (x * y),
+]
+
+# Returns the similarity metrics (one column each, all 7 by default) from
+# the set sizes, with 0 where either set is empty
+def similarityMetrics(intersect, nx, ny, metrics = range(len(METRICS))):
+
+    similarities = np.zeros((len(intersect), len(metrics)))
+    ok = (nx > 0) & (ny > 0)
+    i, x, y = intersect[ok], nx[ok], ny[ok]
+
+    for column, metric in enumerate(metrics):
+        similarities[ok, column] = METRICS[metric](i, x, y)
+
+    return similarities
+
+################################################################################
+
+# Returns (mean, std, max, 1 / mean) per pair, or zeros as in calculateFeatures
+def diceStatistics(similarities, pairs, n):
+
+    counts = np.bincount(pairs, minlength = n)
+    seen = counts > 0
+
+    mean = np.zeros(n)
+    mean[seen] = np.bincount(pairs, similarities, n)[seen] / counts[seen]
+    var = np.zeros(n)
+    var[seen] = np.bincount(pairs, (similarities - mean[pairs])**2, n)[seen] \
+                / counts[seen]
+    maximum = groupMaximum(similarities, pairs, counts)
+
+    statistics = np.zeros((n, 4))
+    ok = mean != 0
+    statistics[ok, 0] = mean[ok]
+    statistics[ok, 1] = np.sqrt(var[ok])
+    statistics[ok, 2] = maximum[ok]
+    statistics[ok, 3] = 1.0 / mean[ok]
+
+    return statistics
+
+################################################################################
+
+# Returns the mean and max of every metric column, interleaved, per pair
+def meanAndMax(similarities, pairs, n):
+
+    counts = np.bincount(pairs, minlength = n)
+    seen = counts > 0
+    features = np.zeros((n, 2 * similarities.shape[1]))
+
+    for j in range(similarities.shape[1]):
+        column = similarities[:, j]
+        features[seen, 2 * j] = \
+                np.bincount(pairs, column, n)[seen] / counts[seen]
+        features[:, 2 * j + 1] = groupMaximum(column, pairs, counts)
+
+    return features
+
+################################################################################
+
+# Returns the maximum of each contiguous group of values (0 for empty groups)
+def groupMaximum(values, pairs, counts):
+
+    maximum = np.zeros(len(counts))
+    seen = counts > 0
+    if (seen.any()):
+        offsets = (np.cumsum(counts) - counts)[seen]
+        maximum[seen] = np.maximum.reduceat(values, offsets)
+
+    return maximum
+
+################################################################################
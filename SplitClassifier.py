@@ -1,53 +1,70 @@
+import numpy as np
+
 from Constants import *
 
 ################################################################################
 
 # Makes very confident predictions based on linearly separating the data
-def splitClassifier(filename):
-
-    file = open(filename, 'r')
-    lines = file.readlines()[1:]
-    x = []
-
-    # Read file into a list of tuples
-    for line in lines:
-        line = line.strip("\n")
-        line = line.split(",")
-        f1 = float(line[1])
-        f2 = float(line[2])
-        x.append((f1, f2))
-
-    split = findSplit(x)
-    predictions = []
-    
-    for (f1, f2) in x:
-        if (f1 + f2 > split):
-            predictions.append(0.99)
-        else:
-            predictions.append(0.01)
-
-    return predictions
+def splitClassifier(filename, ratio = 0.5):
+
+    # Read the first two features of the file into an array
+    x = np.loadtxt(filename, delimiter = ",", skiprows = 1, usecols = (1, 2),
+                   ndmin = 2)
+
+    scores = x[:, 0] + x[:, 1]
+    split = findSplit(x, ratio)
+    predictions = np.where(scores > split, 0.99, 0.01)
+
+    return predictions.tolist()
+
+################################################################################
+
+# Returns a sum that splits the data so that the given ratio of instances
+# have f1 + f2 above it (half of them by default)
+def findSplit(xTest, ratio = 0.5):
+
+    xTest = np.asarray(xTest, dtype=np.float64).reshape(-1, 2)
+
+    return findRateSplit(xTest[:, 0] + xTest[:, 1], ratio)
+
+################################################################################
+
+# Returns a threshold with (about) the given fraction of scores above it,
+# found by sorting the scores once. Tied scores all fall on the same side,
+# so a tie across the split moves it to whichever side of the tie gets the
+# fraction closest to the one asked for
+def findRateSplit(scores, positiveRate):
+
+    scores = np.sort(np.asarray(scores, dtype=np.float64))
+    n = len(scores)
+    assert(n > 0 and 0.0 <= positiveRate <= 1.0)
+
+    # Everything above the threshold is positive, so leave the top k above it
+    k = int(round(positiveRate * n))
+    if (k >= n):
+        return scores[0] - 1.0
+    if (k <= 0):
+        return scores[-1]
+
+    # Halfway between the k-th largest score and the next one down
+    if (scores[n - k - 1] != scores[n - k]):
+        return (scores[n - k - 1] + scores[n - k]) / 2
+
+    # Otherwise the whole tie goes below the threshold (n - high above it)
+    # or above it (n - low above it), with the nearest distinct score
+    tied = scores[n - k]
+    low = np.searchsorted(scores, tied, side = 'left')
+    high = np.searchsorted(scores, tied, side = 'right')
+
+    if (abs((n - low) - k) < abs((n - high) - k)):
+        return scores[0] - 1.0 if (low == 0) \
+               else (scores[low - 1] + tied) / 2
+    return scores[-1] if (high == n) else (tied + scores[high]) / 2
 
 ################################################################################
 
-# Returns a sum that splits the data in half
-def findSplit(xTest):
-    
-    split = -2.0
-
-    # Possible infinite loop is bad...
-    while True:
-        above = 0
-        below = 0
-        for (f1, f2) in xTest:
-            if (f1 + f2 > split):
-                above += 1
-            else:
-                below += 1
-
-        if abs(above - below) < 5:
-            return split
-        else:
-            split += 0.0001
+# Returns a threshold giving `positive : negative` predictions above and below
+def findBalanceSplit(scores, positive = 1, negative = 1):
+    return findRateSplit(scores, positive / (positive + negative))
 
 ################################################################################
@@ -0,0 +1,142 @@
+from itertools import islice
+
+import numpy as np
+
+from Constants import *
+
+################################################################################
+
+class StreamingEvaluator:
+    """
+    Evaluates predictions chunk by chunk in constant memory. Each class's
+    scores are counted in `bins` equal-width bins over [low, high] (scores
+    outside are clipped into the end bins), so evaluators from several
+    processes can be merged by adding their counts.
+
+    Accuracy and the confusion matrix (at 0.5) are exact. The AUC counts
+    (positive, negative) pairs in the same bin as ties, so it is off by at
+    most aucError(), the fraction of such pairs halved.
+    """
+    def __init__(self, bins = STREAMING_BINS, low = 0.0, high = 1.0):
+        self.bins = bins
+        self.low = low
+        self.high = high
+        self.positives = np.zeros(bins, dtype=np.int64)
+        self.negatives = np.zeros(bins, dtype=np.int64)
+        self.confusion = np.zeros(4, dtype=np.int64)
+        self.correct = 0
+
+    # Adds a chunk of true answers and predictions
+    def update(self, real, predictions):
+
+        real = np.asarray(real) == REAL
+        predictions = np.asarray(predictions, dtype=np.float64)
+
+        scaled = (predictions - self.low) / (self.high - self.low)
+        bins = np.clip((scaled * self.bins).astype(np.int64), 0, self.bins - 1)
+        self.positives += np.bincount(bins[real], minlength = self.bins)
+        self.negatives += np.bincount(bins[~real], minlength = self.bins)
+
+        # As in printAccuracy and getConfusionMatrix
+        self.correct += int(np.sum(np.abs(real - predictions) < 0.5))
+        predicted = predictions > 0.5
+        self.confusion += [np.sum(real & predicted), np.sum(~real & predicted),
+                           np.sum(real & ~predicted), np.sum(~real & ~predicted)]
+
+        return self
+
+    # Adds the counts of another evaluator with the same bins
+    def merge(self, other):
+
+        assert((self.bins, self.low, self.high)
+               == (other.bins, other.low, other.high))
+        self.positives += other.positives
+        self.negatives += other.negatives
+        self.confusion += other.confusion
+        self.correct += other.correct
+
+        return self
+
+    # Returns the number of instances seen
+    def total(self):
+        return int(self.positives.sum() + self.negatives.sum())
+
+    # Returns the AUC, counting pairs within a bin as half correct
+    def auc(self):
+        negativesBelow = np.cumsum(self.negatives) - self.negatives
+        wins = np.sum(self.positives * (negativesBelow + 0.5 * self.negatives))
+        return float(wins / self.pairs())
+
+    # Returns the most the AUC can differ from the exact value
+    def aucError(self):
+        return float(0.5 * np.sum(self.positives * self.negatives)
+                     / self.pairs())
+
+    # Returns the number of (positive, negative) pairs
+    def pairs(self):
+        return float(self.positives.sum()) * float(self.negatives.sum())
+
+    # Returns the fraction of predictions on the right side of 0.5
+    def accuracy(self):
+        return self.correct / self.total()
+
+    # Returns TP, FP, FN, TN with predictions above 0.5 counted as REAL
+    def confusionMatrix(self):
+        return tuple(int(count) for count in self.confusion)
+
+    # Prints a summary of the results, like evaluate
+    def printSummary(self):
+        print("Accuracy = {:.2f}%".format(100 * self.accuracy()))
+        print("AUC: {:.4f} (+/- {:.4f})".format(self.auc(), self.aucError()))
+        print("TP = {}, FP = {}, FN = {}, TN = {}"
+              .format(*self.confusionMatrix()))
+
+    # Saves the counts so another process can merge them
+    def save(self, filename):
+        np.savez(filename, positives = self.positives,
+                 negatives = self.negatives, confusion = self.confusion,
+                 correct = self.correct,
+                 range = np.array([self.low, self.high]))
+
+    # Loads counts saved by save
+    @classmethod
+    def load(cls, filename):
+        data = np.load(filename)
+        low, high = data["range"]
+        evaluator = cls(len(data["positives"]), low, high)
+        evaluator.positives += data["positives"]
+        evaluator.negatives += data["negatives"]
+        evaluator.confusion += data["confusion"]
+        evaluator.correct = int(data["correct"])
+        return evaluator
+
+################################################################################
+
+# Evaluates a predictions file (Id,Prediction) against a file whose last
+# column holds the labels (such as a feature file), reading both in chunks
+def evaluateFiles(predictionFile, labelFile, bins = STREAMING_BINS,
+                  chunkRows = CHUNK_ROWS):
+
+    evaluator = StreamingEvaluator(bins)
+
+    with open(predictionFile, 'r') as predictions, \
+         open(labelFile, 'r') as labels:
+        predictionColumn = len(predictions.readline().split(",")) - 1
+        labelColumn = len(labels.readline().split(",")) - 1
+
+        while True:
+            predictionLines = list(islice(predictions, chunkRows))
+            labelLines = list(islice(labels, chunkRows))
+            assert(len(predictionLines) == len(labelLines))
+            if (not predictionLines):
+                break
+
+            evaluator.update(
+                np.loadtxt(labelLines, delimiter = ",", ndmin = 1,
+                           usecols = (labelColumn,)),
+                np.loadtxt(predictionLines, delimiter = ",", ndmin = 1,
+                           usecols = (predictionColumn,)))
+
+    return evaluator
+
+################################################################################
@@ -0,0 +1,186 @@
+import os
+import sys
+import shutil
+import resource
+import tempfile
+from itertools import product
+from multiprocessing import Pool
+
+import numpy as np
+
+from Constants import *
+from CSVWriter import writeCSV
+from Evaluation import calculateAUC
+from FeatureFile import saveFeatureBinary, loadFeatureBinary
+from FileProcessor import processFeatureFile
+from W5_Adaptation import runNN
+
+'''
+Sweeps runNN's settings over the feature files that proj1 uses. The
+features are loaded once, saved as binary feature files and memory-mapped
+read-only by every worker process, and each configuration is trained with
+the NumPy backend and scored on the dev set.
+
+    python Sweep.py        - every configuration in SPACE
+    python Sweep.py 100    - 100 configurations sampled from SPACE
+'''
+
+# The values each setting is swept over (features index the columns that
+# processFeatureFile returns, as in proj1)
+SPACE = {
+    "features": [[0], [1], [2], [3], [0, 1], [2, 3], [0, 1, 2, 3]],
+    "hidden_layers": [[], [2], [4], [4, 2]],
+    "learning_rate": [0.01, 0.05, 0.2],
+    "batch_size": [100, 1000],
+    "epochs": [200, 2000],
+}
+
+# The columns of the results table, after the settings
+RESULTS = ["dev_auc", "seconds", "peak_mb"]
+
+################################################################################
+
+# Returns every configuration in the space, or `samples` of them chosen at
+# random, each with its own seed
+def sweepConfigs(space = SPACE, samples = None, seed = None):
+
+    names = list(space)
+    configs = [dict(zip(names, values))
+               for values in product(*[space[name] for name in names])]
+
+    rng = np.random.default_rng(seed)
+    if (samples is not None and samples < len(configs)):
+        chosen = rng.choice(len(configs), size = samples, replace = False)
+        configs = [configs[i] for i in sorted(chosen.tolist())]
+
+    for config, configSeed in zip(configs,
+                                  rng.integers(0, 2**31, size = len(configs))):
+        config["seed"] = int(configSeed)
+
+    return configs
+
+################################################################################
+
+# Loads the training and dev features like proj1 (training shuffled and cut
+# to TRAINING_LIMIT of each class) and saves them as binary feature files in
+# the directory, returning their names
+def prepareData(directory, seed = None):
+
+    xTrain, yTrain = processFeatureFile(TRAINING_FEATURES_FILE)
+    xDev, yDev = processFeatureFile(DEVELOPMENT_FEATURES_FILE)
+
+    order = np.random.default_rng(seed).permutation(len(xTrain))
+    order = order[:2 * TRAINING_LIMIT]
+
+    trainFile = os.path.join(directory, "training" + FEATURE_BINARY_SUFFIX)
+    devFile = os.path.join(directory, "development" + FEATURE_BINARY_SUFFIX)
+    saveFeatureBinary(trainFile, np.asarray(xTrain)[order],
+                      np.asarray(yTrain)[order])
+    saveFeatureBinary(devFile, xDev, yDev)
+
+    return trainFile, devFile
+
+################################################################################
+
+# The memory-mapped training and dev sets of a worker process
+workerData = None
+
+# Memory-maps the shared feature files once per worker process
+def attachData(trainFile, devFile):
+    global workerData
+    workerData = loadFeatureBinary(trainFile) + loadFeatureBinary(devFile)
+
+################################################################################
+
+# Trains one configuration in a worker process and returns it with its dev
+# AUC, training time and the process's peak memory
+def runConfig(config):
+
+    xTrain, yTrain, xDev, yDev = workerData
+    features = config["features"]
+    np.random.seed(config["seed"])
+
+    start = timer()
+    predictions = runNN(xTrain[:, features] + ADD_E, yTrain,
+                        xDev[:, features] + ADD_E,
+                        hidden_layers = config["hidden_layers"],
+                        backend = "numpy",
+                        learning_rate = config["learning_rate"],
+                        batch_size = config["batch_size"],
+                        epochs = config["epochs"], verbose = False,
+                        seed = config["seed"])
+    end = timer()
+
+    result = dict(config)
+    result["dev_auc"] = calculateAUC(yDev, predictions)
+    result["seconds"] = end - start
+
+    # Linux reports the peak resident set size in kilobytes
+    result["peak_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss \
+                        / 1024
+
+    return result
+
+################################################################################
+
+# Runs the configurations across a pool of processes and writes the results
+# table, best dev AUC first
+def runSweep(configs, workers = SWEEP_WORKERS, outputFile = SWEEP_FILE,
+             verbose = True):
+
+    workers = workers or os.cpu_count()
+    directory = tempfile.mkdtemp()
+
+    try:
+        files = prepareData(directory)
+        results = []
+
+        # A fresh process per configuration keeps each peak memory separate
+        with Pool(workers, initializer = attachData, initargs = files,
+                  maxtasksperchild = 1) as pool:
+            for result in pool.imap_unordered(runConfig, configs):
+                results.append(result)
+                if (verbose):
+                    print("Completed {} / {}: dev AUC = {:.4f} ({:.2f} secs)"
+                          .format(len(results), len(configs),
+                                  result["dev_auc"], result["seconds"]))
+    finally:
+        shutil.rmtree(directory, ignore_errors = True)
+
+    results.sort(key = lambda result: -result["dev_auc"])
+    writeResults(outputFile, results)
+
+    return results
+
+################################################################################
+
+# Writes the results table, with list settings written as space-separated
+# values so they stay in one CSV cell
+def writeResults(filename, results):
+
+    names = [name for name in results[0] if (name not in RESULTS)]
+    names += RESULTS
+
+    columns = []
+    for name in names:
+        values = [result[name] for result in results]
+        if (isinstance(values[0], list)):
+            values = [" ".join(str(v) for v in value) for value in values]
+        columns.append(np.asarray(values))
+
+    writeCSV(filename, ",".join(names), columns)
+
+################################################################################
+
+if (__name__ == "__main__"):
+
+    totalStart = timer()
+
+    samples = int(sys.argv[1]) if (len(sys.argv) > 1) else None
+    results = runSweep(sweepConfigs(samples = samples))
+
+    print("Results saved as: {}".format(SWEEP_FILE))
+    for result in results[:5]:
+        print(", ".join("{} = {}".format(name, result[name])
+                        for name in result))
+    print("Total elapsed time: {:.2f} secs".format(timer() - totalStart))
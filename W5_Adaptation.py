@@ -1,38 +1,88 @@
 # Note: This file is from the week 5 workshop with minor additions
 
-import tensorflow as tf
+import threading
+
 import numpy as np
 
 from Constants import *
+from NumpyNN import trainNumpy
+from Predictor import saveModel
+from EarlyStopping import EarlyStopping
+
+# The number of permuted copies of the data set each DatasetIterator mode
+# keeps
+ITERATOR_BUFFERS = {"copy": 0, "buffered": 1, "prefetch": 2}
 
 ################################################################################
 
 class DatasetIterator:
     """
     An iterator that returns randomized batches
-    from a data set (with features and labels)
+    from a data set (with features and labels).
+
+    In "copy" mode each batch is gathered with fancy indexing. In "buffered"
+    mode the whole data set is permuted once per epoch into preallocated
+    arrays and the batches are slice views of them, which stay valid until
+    the next epoch starts. "prefetch" mode is buffered with two sets of
+    arrays, permuting the next epoch in a background thread while the
+    current one is used.
     """
-    def __init__(self, features, labels):
+    def __init__(self, features, labels, mode = ITERATOR_MODE,
+                 batch_size = BATCH_SIZE):
+        if (mode not in ITERATOR_BUFFERS):
+            raise ValueError("Unknown iterator mode: {} (expected one of {})"
+                             .format(mode, ", ".join(ITERATOR_BUFFERS)))
         assert(features.shape[0] == labels.shape[0])
-        assert(BATCH_SIZE > 0 and BATCH_SIZE <= features.shape[0])
+        assert(batch_size > 0 and batch_size <= features.shape[0])
         self.features = features
         self.labels = labels
+        self.mode = mode
+        self.batch_size = batch_size
         self.num_instances = features.shape[0]
-        self.num_batches = self.num_instances // BATCH_SIZE
-        if (self.num_instances % BATCH_SIZE != 0):
+        self.num_batches = self.num_instances // batch_size
+        if (self.num_instances % batch_size != 0):
             self.num_batches += 1
         self._i = 0
         self._rand_ids = None
 
+        # The buffers being read (first) and prefetched into (second)
+        self._buffers = [(np.empty_like(features), np.empty_like(labels))
+                         for i in range(ITERATOR_BUFFERS[mode])]
+        self._thread = None
+
+    def __len__(self):
+        return self.num_batches
+
     def __iter__(self):
         self._i = 0
-        self._rand_ids = np.random.permutation(self.num_instances)
+        if (self.mode == "copy"):
+            self._rand_ids = np.random.permutation(self.num_instances)
+        elif (self.mode == "buffered"):
+            self._shuffle_into(self._buffers[0])
+        else:
+            if (self._thread is None):
+                self._shuffle_into(self._buffers[1])
+            else:
+                self._thread.join()
+            self._buffers.reverse()
+            self._thread = threading.Thread(target = self._shuffle_into,
+                                            args = (self._buffers[1],),
+                                            daemon = True)
+            self._thread.start()
         return self
         
     def __next__(self):
-        if self.num_instances - self._i >= BATCH_SIZE:
-            this_rand_ids = self._rand_ids[self._i:self._i + BATCH_SIZE]
-            self._i += BATCH_SIZE
+        if (self.mode != "copy"):
+            if (self._i >= self.num_instances):
+                raise StopIteration()
+            start = self._i
+            self._i = min(start + self.batch_size, self.num_instances)
+            features, labels = self._buffers[0]
+            return features[start:self._i], labels[start:self._i]
+
+        if self.num_instances - self._i >= self.batch_size:
+            this_rand_ids = self._rand_ids[self._i:self._i + self.batch_size]
+            self._i += self.batch_size
             return self.features[this_rand_ids], self.labels[this_rand_ids]
         elif self.num_instances - self._i > 0:
             this_rand_ids = self._rand_ids[self._i::]
@@ -41,10 +91,25 @@ class DatasetIterator:
         else:
             raise StopIteration()
 
+    # Writes a random permutation of the data set into a pair of buffers
+    def _shuffle_into(self, buffers):
+        rand_ids = np.random.permutation(self.num_instances)
+        np.take(self.features, rand_ids, axis = 0, out = buffers[0])
+        np.take(self.labels, rand_ids, axis = 0, out = buffers[1])
+
 ################################################################################
 
-# Runs a neural network in TensorFlow to make predictions on the data
-def runNN(xTrain, yTrain, xTest, hidden_layers = []):
+# Runs a neural network to make predictions on the data, in TensorFlow or
+# (backend = "numpy") in plain NumPy, with mini-batches of batch_size or
+# (full_batch = True) the whole training set per step. Given a model_file,
+# the trained network is saved for Predictor, along with the feature file
+# columns it was trained on. Given a validation set (xDev, yDev), training
+# stops early once its AUC stops improving, keeping the best weights
+def runNN(xTrain, yTrain, xTest, hidden_layers = [], backend = NN_BACKEND,
+          full_batch = False, model_file = None, features = None,
+          xDev = None, yDev = None, learning_rate = LEARNING_RATE,
+          batch_size = BATCH_SIZE, epochs = EPOCHS, verbose = True,
+          seed = None):
 
     # The number of features and labels in the given data
     num_features = len(xTrain[0])
@@ -58,7 +123,48 @@ def runNN(xTrain, yTrain, xTest, hidden_layers = []):
     yTrain = np.asarray(yTrain)
     xTest = np.asarray(xTest)
     
-    train_iterator = DatasetIterator(xTrain, yTrain)
+    train_iterator = None if (full_batch) \
+                     else DatasetIterator(xTrain, yTrain,
+                                          batch_size = batch_size)
+    monitor = None if (xDev is None) \
+              else EarlyStopping(xDev, yDev, verbose = verbose)
+
+    if (backend == "numpy"):
+        model = trainNumpy(xTrain, yTrain, hidden_layers,
+                           iterator = train_iterator, epochs = epochs,
+                           learningRate = learning_rate, seed = seed,
+                           verbose = verbose, monitor = monitor)
+        predictions = list(model.predict(xTest))
+        weights, biases = model.weights, model.biases
+    elif (backend == "tensorflow"):
+        if (train_iterator is None):
+            train_iterator = [(xTrain, yTrain)]
+        predictions, weights, biases = \
+                     runTensorFlow(train_iterator, xTest, num_features,
+                                   num_classes, hidden_layers, monitor,
+                                   learning_rate, epochs, verbose)
+    else:
+        raise ValueError("Unknown backend: {}".format(backend))
+
+    if (model_file is not None):
+        if (features is None):
+            features = list(range(num_features))
+        saveModel(model_file, weights, biases, features)
+        if (verbose):
+            print("Model saved as: {}".format(model_file))
+
+    return predictions
+
+################################################################################
+
+# Trains the network in TensorFlow (only imported when used) and returns its
+# predictions for xTest, along with the trained weights and biases
+def runTensorFlow(train_iterator, xTest, num_features, num_classes,
+                  hidden_layers, monitor = None,
+                  learning_rate = LEARNING_RATE, epochs = EPOCHS,
+                  verbose = True):
+
+    import tensorflow as tf
 
     X = tf.placeholder(dtype=tf.float32,
                        shape=[None, num_features], name="features")
@@ -102,7 +208,7 @@ def runNN(xTrain, yTrain, xTest, hidden_layers = []):
         
         loss = tf.losses.mean_squared_error(Y, Y_pred)
     
-    opt = tf.train.GradientDescentOptimizer(LEARNING_RATE)
+    opt = tf.train.GradientDescentOptimizer(learning_rate)
     opt_operation = opt.minimize(loss)
 
     with tf.Session() as sess:
@@ -112,20 +218,34 @@ def runNN(xTrain, yTrain, xTest, hidden_layers = []):
         start = timer()
         
         # Run gradient descent for multiple epochs
-        for epoch in range(EPOCHS):
+        for epoch in range(epochs):
             avg_loss = 0
             for X_batch, Y_batch in train_iterator:
                 _, l = sess.run([opt_operation, loss], \
                                   feed_dict = {X: X_batch, Y: Y_batch})
-                avg_loss += l / train_iterator.num_batches
+                avg_loss += l / len(train_iterator)
             current = timer()
-            print("Epoch {} / {}: loss = {:.4f} ({:.2f} secs)"
-                  .format(epoch + 1, EPOCHS, avg_loss, current - start))
-        print("Optimization complete.")
+            if (verbose):
+                print("Epoch {} / {}: loss = {:.4f} ({:.2f} secs)"
+                      .format(epoch + 1, epochs, avg_loss, current - start))
+            if (monitor is not None and monitor.due(epoch)):
+                if (monitor.update(epoch,
+                                   Y_pred.eval({X: monitor.xDev, Y: []}),
+                                   sess.run(W + b))):
+                    break
+
+        # Put the best weights and biases back into the graph
+        if (monitor is not None and monitor.bestParameters is not None):
+            monitor.report()
+            for variable, value in zip(W + b, monitor.bestParameters):
+                variable.load(value, sess)
+        if (verbose):
+            print("Optimization complete.")
 
         # Make predictions
         predictions = Y_pred.eval({X: xTest, Y: []})
+        weights, biases = sess.run([W, b])
         
-    return list(predictions)
+    return list(predictions), weights, biases
 
 ################################################################################
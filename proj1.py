@@ -1,10 +1,14 @@
+import sys
 from random import random, shuffle
-from matplotlib import pyplot as plt
 
 from Constants import *
 from Evaluation import evaluate, printAccuracy
 from W5_Adaptation import runNN
 from FeatureProcessor import processFeatures
+from MinHash import MinHashSketch
+from FeatureStore import FeatureStore
+from CSVWriter import writeNumberedCSV
+from FeatureFile import saveFeatureBinary, exportFeatureCSV, binaryName
 from SplitClassifier import splitClassifier
 from NeighbourClassifier import neighbourClassifier
 from FileProcessor import processTrainingFile, processTestFile, \
@@ -18,9 +22,12 @@ def randomClassifier(x):
 
 ################################################################################
 
-# Plots the given data with the colour representing real and fake
+# Plots the given data with the colour representing real and fake (matplotlib
+# is only imported when plotting)
 def plotData(features, labels, title = None):
 
+    from matplotlib import pyplot as plt
+
     reals = []
     fakes = []
 
@@ -51,15 +58,11 @@ def moveIn(x):
 
 ################################################################################
 
-# Writes the predictions to a file
+# Writes the predictions to the first free predictions-N.csv file
 def writeToFile(predictions):
 
-    # Write the predictions to .csv format
-    data = "Id,Prediction\n"
-    for i in range(len(predictions)):
-        data += "{},{}\n".format(i + 1, predictions[i])
-
-    filename = saveFile(data)
+    filename = writeNumberedCSV(SAVE_FILE, ".csv", "Id,Prediction",
+                                [range(1, len(predictions) + 1), predictions])
 
     if (filename is not None):
         print("File saved as: {}".format(filename))
@@ -68,59 +71,12 @@ def writeToFile(predictions):
 
 ################################################################################
 
-# Finds a suitable filename and saves the file
-def saveFile(data):
-
-    n = 0
-    
-    while (n < MAX_FILES):
-        
-        filename = str(SAVE_FILE + str(n) + ".csv")
-        
-        try:
-            file = open(filename, 'r')
-            file.close()
-            n += 1
-        except FileNotFoundError:
-            file = open(filename, 'w')
-            file.write(data)
-            file.close()
-            return filename
-
-    # n exceeded MAX_FILES
-    return None
-
-################################################################################
-
-# Saves a given list of features to a file
+# Saves a given list of features in the binary format, with a CSV export
 def saveFeatureFile(filename, x, y = None):
 
-    # Initialise header row
-    data = "Id"
-    for i in range(0, FEATURES):
-        data += ",f{}".format(i + 1)
-
-    if (y is None):
-        data += "\n"
-    else:
-        data += ",label\n"
-
-    # Write instances as rows
-    for i in range(len(x)):
-
-        data += "{}".format(i)
-        for j in range(0, FEATURES):
-            data += ",{}".format(x[i][j])
-
-        # Add label to last column if applicable
-        if (y is None):
-            data += "\n"
-        else:
-            data += ",{}\n".format(y[i])
-
-    file = open(filename, 'w')
-    file.write(data)
-    file.close()
+    x = [instance[:FEATURES] for instance in x]
+    exportFeatureCSV(filename, x, y)
+    saveFeatureBinary(binaryName(filename), x, y, source = filename)
     print("File saved successfully.")
 
 ################################################################################
@@ -165,13 +121,19 @@ def createFeatureFiles(verbose = False):
               .format(end - start))
         print("Number of test instances: {}".format(len(xTest)))
 
-    # Convert files to our features
+    # Convert files to our features (optionally estimated with MinHash)
     start = timer()
-    xTrain = processFeatures(xTrain, sourceDict, sinkDict, verbose = verbose)
+    sketch = MinHashSketch(sourceDict.graph) if (APPROXIMATE) else None
+    store = FeatureStore(sourceDict.graph, "dice", sketch) \
+            if (FEATURE_STORE_DIR is not None) else None
+    xTrain = processFeatures(xTrain, sourceDict, sinkDict, verbose = verbose,
+                             sketch = sketch, store = store)
     saveFeatureFile("training-features.txt", xTrain, yTrain)
-    xDev = processFeatures(xDev, sourceDict, sinkDict, verbose = verbose)
+    xDev = processFeatures(xDev, sourceDict, sinkDict, verbose = verbose,
+                           sketch = sketch, store = store)
     saveFeatureFile("development-features.txt", xDev, yDev)
-    xTest = processFeatures(xTest, sourceDict, sinkDict, verbose = verbose)
+    xTest = processFeatures(xTest, sourceDict, sinkDict, verbose = verbose,
+                            sketch = sketch, store = store)
     saveFeatureFile("test-features.txt", xTest)
     end = timer()
 
@@ -189,7 +151,7 @@ def addE(x):
     for i in range(len(x)):
         x[i] = list(x[i])
         for j in range(FEATURES):
-            x[i][j] += 0.001
+            x[i][j] += ADD_E
         x[i] = tuple(x[i])
 
     return x
@@ -209,44 +171,92 @@ def reduceFeatures(x, indexes):
 
 ################################################################################
 
-totalStart = timer()
+# Predicts the test set (or the dev set if not testing) with the neural
+# network on the selected features
+def runNetwork(features, hidden_layers, testing = True,
+               early_stopping = True):
 
-xTrain, yTrain = processFeatureFile(TRAINING_FEATURES_FILE)
-xTrain, yTrain = shuffleLists(xTrain, yTrain)
+    xTrain, yTrain = processFeatureFile(TRAINING_FEATURES_FILE)
+    xTrain, yTrain = shuffleLists(xTrain, yTrain)
 
-xTrain = xTrain[:2 * TRAINING_LIMIT]
-yTrain = yTrain[:2 * TRAINING_LIMIT]
+    xTrain = xTrain[:2 * TRAINING_LIMIT]
+    yTrain = yTrain[:2 * TRAINING_LIMIT]
 
-xDev, yDev = processFeatureFile(DEVELOPMENT_FEATURES_FILE)
-xDev, yDev = shuffleLists(xDev, yDev)
+    xDev, yDev = processFeatureFile(DEVELOPMENT_FEATURES_FILE)
+    xDev, yDev = shuffleLists(xDev, yDev)
 
-xTest = processFeatureFile(TEST_FEATURES_FILE)
+    xTest = processFeatureFile(TEST_FEATURES_FILE)
 
-# Ensure no features are 0.0
-xTrain = addE(xTrain)
-xDev = addE(xDev)
-xTest = addE(xTest)
+    # Ensure no features are 0.0
+    xTrain = addE(xTrain)
+    xDev = addE(xDev)
+    xTest = addE(xTest)
 
-features = [4]
-hidden_layers = [2]
+    xTrain = reduceFeatures(xTrain, features)
+    xDev = reduceFeatures(xDev, features)
+    xTest = reduceFeatures(xTest, features)
 
-xTrain = reduceFeatures(xTrain, features)
-xDev = reduceFeatures(xDev, features)
-xTest = reduceFeatures(xTest, features)
+    # Stop training once the dev set AUC stops improving (this makes the dev
+    # set AUC reported below slightly optimistic)
+    xStop, yStop = (xDev, yDev) if (early_stopping) else (None, None)
 
-testing = True
+    if (testing):
+        return runNN(xTrain, yTrain, xTest, hidden_layers = hidden_layers,
+                     model_file = MODEL_FILE, features = features,
+                     xDev = xStop, yDev = yStop)
 
-if (testing):
-    predictions = runNN(xTrain, yTrain, xTest, hidden_layers = hidden_layers)
-else:
-    predictions = runNN(xTrain, yTrain, xDev, hidden_layers = hidden_layers)
+    predictions = runNN(xTrain, yTrain, xDev, hidden_layers = hidden_layers,
+                        xDev = xStop, yDev = yStop)
     evaluate(yDev, predictions)
 
-writeToFile(predictions)
+    return predictions
+
+################################################################################
+
+# Predicts the test set from the nearest neighbours of each source in the
+# training graph
+def runNeighbours():
+
+    sourceDict, sinkDict, xTrain, yTrain, xDev, yDev = \
+                processTrainingFile(TRAIN_FILE)
+    xTest = processTestFile(TEST_FILE)
+
+    return neighbourClassifier(xTest, sourceDict, sinkDict = sinkDict)
+
+################################################################################
 
-totalEnd = timer()
-print("Features: {}".format(features))
-print("Hidden Layers: {}".format(hidden_layers))
-print("Total elapsed time: {:.2f} secs".format(totalEnd - totalStart))
+# Runs the chosen classifier and writes its predictions (behind the __main__
+# guard, so that pool workers started with spawn do not run it again)
+def main():
+
+    totalStart = timer()
+
+    # The classifier to run can also be given on the command line, e.g.
+    # "python proj1.py split"
+    mode = sys.argv[1] if (len(sys.argv) > 1) else CLASSIFIER
+
+    features = [4]
+    hidden_layers = [2]
+
+    if (mode == "nn"):
+        predictions = runNetwork(features, hidden_layers, testing = True)
+    elif (mode == "split"):
+        predictions = splitClassifier(TEST_FEATURES_FILE)
+    elif (mode == "knn"):
+        predictions = runNeighbours()
+    else:
+        raise ValueError("Unknown classifier: {} (expected nn, split or knn)"
+                         .format(mode))
+
+    writeToFile(predictions)
+
+    totalEnd = timer()
+    if (mode == "nn"):
+        print("Features: {}".format(features))
+        print("Hidden Layers: {}".format(hidden_layers))
+    print("Total elapsed time: {:.2f} secs".format(totalEnd - totalStart))
 
 ################################################################################
+
+if (__name__ == "__main__"):
+    main()